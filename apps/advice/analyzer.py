@@ -3,112 +3,164 @@ AI建议分析器 - Phase 7实现
 根据StepRun的metrics和evidence生成可执行的建议补丁
 """
 import json
-from typing import Dict, List, Any
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, Iterable, List, Any, Union
+from django.db import transaction
+from django.utils.module_loading import import_string
 from apps.projects.models import StepRun, Advice
-from .hvg_analyzer import HVGAdviceAnalyzer
-from .pca_analyzer import PCAAdviceAnalyzer
-from .umap_analyzer import UMAPAdviceAnalyzer
-from .cluster_analyzer import ClusteringAdviceAnalyzer
+from .constants import ADVICE_PARAM_OPT, ADVICE_QUALITY, RISK_MED, RISK_HIGH
+from .rules import Rule, Suggestion, evaluate
+
+
+QC_RULES = (
+    # 检查线粒体基因比例过高
+    Rule(
+        predicate=lambda c: c['high_mito'] > 0.15,
+        title='线粒体基因比例阈值建议调整',
+        description='当前有{high_mito:.1%}的细胞线粒体基因比例过高，建议调整过滤阈值以改善数据质量。',
+        evidence_text='检测到{high_mito:.1%}细胞线粒体基因占比超标，可能影响下游分析质量',
+        patch=lambda c: {
+            'max_mito': max(0.05, c['high_mito'] * 0.8)  # 适度降低阈值
+        },
+        advice_type=ADVICE_PARAM_OPT,
+        risk_level=RISK_MED,
+    ),
+    # 检查双细胞率
+    Rule(
+        predicate=lambda c: c['doublet_rate'] > 0.05,
+        title='双细胞检测率偏高',
+        description='检测到{doublet_rate:.1%}的双细胞率，建议增强过滤或重新评估实验条件。',
+        evidence_text='双细胞率{doublet_rate:.1%}超过推荐值5%，可能需要额外的过滤步骤',
+        patch=lambda c: {
+            'enable_doublet_filter': True,
+            'doublet_threshold': 0.8
+        },
+        advice_type=ADVICE_QUALITY,
+        risk_level=RISK_HIGH,
+    ),
+    # 检查基因数范围
+    Rule(
+        predicate=lambda c: c['cell_count'] < 1000,
+        title='细胞数量较少，建议放宽过滤条件',
+        description='当前仅保留{cell_count}个细胞，建议适当放宽基因数过滤条件以保留更多细胞。',
+        evidence_text='过滤后细胞数{cell_count}可能不足以进行稳健的下游分析',
+        patch=lambda c: {
+            'min_genes': max(100, c['min_genes'] - 50),
+            'max_genes': c['max_genes'] + 1000
+        },
+        advice_type=ADVICE_PARAM_OPT,
+        risk_level=RISK_MED,
+    ),
+)
+
+# 一次解包读取指标/参数（缺省值预先合并），避免逐键 .get
+_QC_METRICS_DEFAULTS = {'high_mito': 0, 'doublet_rate': 0, 'cells': 0}
+_QC_GET_METRICS = itemgetter('high_mito', 'doublet_rate', 'cells')
+_QC_PARAMS_DEFAULTS = {'min_genes': 200, 'max_genes': 5000}
+_QC_GET_PARAMS = itemgetter('min_genes', 'max_genes')
 
 
 class QCAdviceAnalyzer:
     """质量控制步骤的AI建议分析器"""
-    
+
+    RULES = QC_RULES
+
     @staticmethod
-    def analyze(step_run: StepRun) -> List[Dict[str, Any]]:
+    def context(step_run: StepRun) -> Dict[str, Any]:
+        high_mito, doublet_rate, cell_count = _QC_GET_METRICS(
+            {**_QC_METRICS_DEFAULTS, **(step_run.metrics_json or {})}
+        )
+        min_genes, max_genes = _QC_GET_PARAMS({**_QC_PARAMS_DEFAULTS, **(step_run.params_json or {})})
+
+        return {
+            'high_mito': high_mito,
+            'doublet_rate': doublet_rate,
+            'min_genes': min_genes,
+            'max_genes': max_genes,
+            'cell_count': cell_count,
+        }
+
+    @classmethod
+    def analyze(cls, step_run: StepRun) -> List[Suggestion]:
         """分析QC结果并生成建议"""
-        metrics = step_run.metrics_json or {}
-        params = step_run.params_json or {}
-        
-        suggestions = []
-        
-        # 检查线粒体基因比例过高
-        high_mito = metrics.get('high_mito', 0)
-        if high_mito > 0.15:
-            suggestions.append({
-                'advice_type': 'parameter_optimization',
-                'risk_level': 'medium',
-                'title': '线粒体基因比例阈值建议调整',
-                'description': f'当前有{high_mito:.1%}的细胞线粒体基因比例过高，建议调整过滤阈值以改善数据质量。',
-                'evidence_text': f'检测到{high_mito:.1%}细胞线粒体基因占比超标，可能影响下游分析质量',
-                'patch_json': {
-                    'max_mito': max(0.05, high_mito * 0.8)  # 适度降低阈值
-                },
-                'patch_type': 'params'
-            })
-        
-        # 检查双细胞率
-        doublet_rate = metrics.get('doublet_rate', 0)
-        if doublet_rate > 0.05:
-            suggestions.append({
-                'advice_type': 'quality_improvement',
-                'risk_level': 'high',
-                'title': '双细胞检测率偏高',
-                'description': f'检测到{doublet_rate:.1%}的双细胞率，建议增强过滤或重新评估实验条件。',
-                'evidence_text': f'双细胞率{doublet_rate:.1%}超过推荐值5%，可能需要额外的过滤步骤',
-                'patch_json': {
-                    'enable_doublet_filter': True,
-                    'doublet_threshold': 0.8
-                },
-                'patch_type': 'params'
-            })
-        
-        # 检查基因数范围
-        min_genes = params.get('min_genes', 200)
-        max_genes = params.get('max_genes', 5000)
-        cell_count = metrics.get('cells', 0)
-        
-        if cell_count < 1000:
-            suggestions.append({
-                'advice_type': 'parameter_optimization',
-                'risk_level': 'medium',
-                'title': '细胞数量较少，建议放宽过滤条件',
-                'description': f'当前仅保留{cell_count}个细胞，建议适当放宽基因数过滤条件以保留更多细胞。',
-                'evidence_text': f'过滤后细胞数{cell_count}可能不足以进行稳健的下游分析',
-                'patch_json': {
-                    'min_genes': max(100, min_genes - 50),
-                    'max_genes': max_genes + 1000
-                },
-                'patch_type': 'params'
-            })
-        
-        return suggestions
+        return evaluate(cls.RULES, cls.context(step_run))
+
+
+# 建议生成只读取这些列，其余（evidence_json 等）不必从数据库取回
+ADVICE_FIELDS = ('id', 'organization_id', 'step__step_type', 'metrics_json', 'params_json')
+
+
+@lru_cache(maxsize=None)
+def _load_analyzer(path: str):
+    """按点路径导入分析器类（结果缓存，每个路径只导入一次）"""
+    return import_string(path)
 
 
 class AdviceEngine:
     """主要的建议引擎"""
     
+    # 以点路径登记，首次使用时才导入对应模块，减少进程启动开销
     ANALYZERS = {
-        'qc': QCAdviceAnalyzer,
-        'hvg': HVGAdviceAnalyzer,
-        'pca': PCAAdviceAnalyzer,
-        'umap': UMAPAdviceAnalyzer,
-        'clustering': ClusteringAdviceAnalyzer,
+        'qc': 'apps.advice.analyzer.QCAdviceAnalyzer',
+        'hvg': 'apps.advice.hvg_analyzer.HVGAdviceAnalyzer',
+        'pca': 'apps.advice.pca_analyzer.PCAAdviceAnalyzer',
+        'umap': 'apps.advice.umap_analyzer.UMAPAdviceAnalyzer',
+        'clustering': 'apps.advice.cluster_analyzer.ClusteringAdviceAnalyzer',
         # 后续可扩展其他分析器
     }
+
+    @classmethod
+    def get_analyzer(cls, step_type: str):
+        """返回步骤类型对应的分析器类，不支持的类型返回 None"""
+        path = cls.ANALYZERS.get(step_type)
+        return _load_analyzer(path) if path else None
     
     @classmethod
     def generate_advice(cls, step_run: StepRun):
         """为给定的StepRun生成AI建议"""
         step_type = step_run.step.step_type
-        analyzer = cls.ANALYZERS.get(step_type)
+        analyzer = cls.get_analyzer(step_type)
         
         if not analyzer:
             return  # 暂不支持的步骤类型
         
         suggestions = analyzer.analyze(step_run)
         
-        # 保存建议到数据库
-        for suggestion in suggestions:
-            advice = Advice.objects.create(
-                step_run=step_run,
-                advice_type=suggestion['advice_type'],
-                risk_level=suggestion['risk_level'],
-                title=suggestion['title'],
-                description=suggestion['description'],
-                evidence_text=suggestion['evidence_text'],
-                patch_json=suggestion['patch_json'],
-                patch_type=suggestion['patch_type']
-            )
-            
-        return len(suggestions)
\ No newline at end of file
+        # 保存建议到数据库：单次 bulk_create 合并为一条多行 INSERT
+        objs = [Advice(step_run=step_run, organization_id=step_run.organization_id, **suggestion._asdict()) for suggestion in suggestions]
+        with transaction.atomic():
+            Advice.objects.bulk_create(objs, batch_size=500)
+
+        return len(objs)
+
+    @classmethod
+    def generate_advice_by_id(cls, step_run_id):
+        """按主键加载仅含建议所需列的StepRun并生成AI建议（单条批量，与批量入口共用加载/入库路径）"""
+        return cls.generate_advice_batch([step_run_id])
+
+    @classmethod
+    def generate_advice_batch(cls, step_runs: Iterable[Union[StepRun, Any]]) -> int:
+        """批量为多个StepRun生成AI建议，所有建议在一个事务内一次 bulk_create 入库
+        目前由 generate_advice_by_id（advice 队列任务）以单条调用；不存在的主键被跳过
+
+        Args:
+            step_runs: StepRun 实例或其主键；统一以 select_related('step') + in_bulk
+                重新加载，避免逐条访问 step.step_type 触发 N+1
+        Returns:
+            int: 生成的建议总数
+        """
+        ids = [getattr(r, 'pk', r) for r in step_runs]
+        runs = StepRun.objects.select_related('step').only(*ADVICE_FIELDS).in_bulk(ids)
+
+        objs: List[Advice] = []
+        for run in runs.values():
+            analyzer = cls.get_analyzer(run.step.step_type)
+            if not analyzer:
+                continue
+            objs.extend(Advice(step_run=run, organization_id=run.organization_id, **suggestion._asdict()) for suggestion in analyzer.analyze(run))
+
+        with transaction.atomic():
+            Advice.objects.bulk_create(objs, batch_size=500)
+
+        return len(objs)
@@ -3,64 +3,79 @@ Clustering Advice Analyzer
 
 为 Clustering 步骤提供智能建议
 """
+from operator import itemgetter
 from typing import Dict, List, Any
 
-class ClusteringAdviceAnalyzer:
-    """聚类步骤的AI建议分析器"""
+from .constants import ADVICE_PARAM_OPT, ADVICE_METHOD, RISK_LOW, RISK_MED
+from .rules import Rule, Suggestion, evaluate
 
-    @staticmethod
-    def analyze(step_run) -> List[Dict[str, Any]]:
-        metrics = step_run.metrics_json or {}
-        params = step_run.params_json or {}
 
-        suggestions: List[Dict[str, Any]] = []
+RULES = (
+    # 建议1：轮廓系数偏低，建议提高分辨率
+    Rule(
+        predicate=lambda c: 0 < c['silhouette'] < 0.35,
+        title='聚类轮廓系数偏低，建议提高分辨率',
+        description='当前 silhouette_score={silhouette:.2f} 偏低，增大 resolution 有助于提升类间分离。',
+        evidence_text='silhouette_score={silhouette:.2f} < 0.35',
+        patch=lambda c: {
+            'resolution': min(1.5, round(c['resolution'] + 0.2, 2))
+        },
+        advice_type=ADVICE_PARAM_OPT,
+        risk_level=RISK_MED,
+    ),
+    # 建议2：类簇过多，建议降低分辨率
+    Rule(
+        predicate=lambda c: c['n_clusters'] > 20 and c['resolution'] >= 0.8,
+        title='聚类簇数较多，建议降低分辨率以合并过细簇',
+        description='当前簇数 {n_clusters} 个，可能过细，建议适度降低分辨率以获得更稳定的簇结构。',
+        evidence_text='n_clusters={n_clusters} > 20 且 resolution={resolution}',
+        patch=lambda c: {
+            'resolution': max(0.4, round(c['resolution'] * 0.8, 2))
+        },
+        advice_type=ADVICE_PARAM_OPT,
+        risk_level=RISK_LOW,
+    ),
+    # 建议3：方法选择提示
+    Rule(
+        predicate=lambda c: c['method'] == 'louvain' and c['silhouette'] < 0.4,
+        title='建议尝试 Leiden 聚类方法',
+        description='Leiden 通常在单细胞聚类任务中表现更稳定，建议从 Louvain 切换到 Leiden。',
+        evidence_text='当前方法 {method} 的轮廓系数 {silhouette:.2f} 一般，Leiden 常常提供更稳定的结果。',
+        patch=lambda c: {
+            'method': 'leiden'
+        },
+        advice_type=ADVICE_METHOD,
+        risk_level=RISK_LOW,
+    ),
+)
+
+# 一次解包读取指标/参数（缺省值预先合并），避免逐键 .get；method/resolution 以参数优先、指标兜底
+_METRICS_DEFAULTS = {'method': 'leiden', 'resolution': 0.8, 'silhouette_score': 0, 'n_clusters': 0}
+_GET_METRICS = itemgetter('method', 'resolution', 'silhouette_score', 'n_clusters')
+_GET_PARAMS = itemgetter('method', 'resolution')
 
-        method = params.get('method', metrics.get('method', 'leiden'))
-        resolution = params.get('resolution', metrics.get('resolution', 0.8))
-        silhouette = metrics.get('silhouette_score', 0)
-        n_clusters = metrics.get('n_clusters', 0)
 
-        # 建议1：轮廓系数偏低，建议提高分辨率
-        if silhouette > 0 and silhouette < 0.35:
-            target_res = min(1.5, round(resolution + 0.2, 2))
-            suggestions.append({
-                'advice_type': 'parameter_optimization',
-                'risk_level': 'medium',
-                'title': '聚类轮廓系数偏低，建议提高分辨率',
-                'description': f'当前 silhouette_score={silhouette:.2f} 偏低，增大 resolution 有助于提升类间分离。',
-                'evidence_text': f'silhouette_score={silhouette:.2f} < 0.35',
-                'patch_json': {
-                    'resolution': target_res
-                },
-                'patch_type': 'params'
-            })
+class ClusteringAdviceAnalyzer:
+    """聚类步骤的AI建议分析器"""
 
-        # 建议2：类簇过多，建议降低分辨率
-        if n_clusters > 20 and resolution >= 0.8:
-            suggestions.append({
-                'advice_type': 'parameter_optimization',
-                'risk_level': 'low',
-                'title': '聚类簇数较多，建议降低分辨率以合并过细簇',
-                'description': f'当前簇数 {n_clusters} 个，可能过细，建议适度降低分辨率以获得更稳定的簇结构。',
-                'evidence_text': f'n_clusters={n_clusters} > 20 且 resolution={resolution}',
-                'patch_json': {
-                    'resolution': max(0.4, round(resolution * 0.8, 2))
-                },
-                'patch_type': 'params'
-            })
+    RULES = RULES
+
+    @staticmethod
+    def context(step_run) -> Dict[str, Any]:
+        method, resolution, silhouette, n_clusters = _GET_METRICS(
+            {**_METRICS_DEFAULTS, **(step_run.metrics_json or {})}
+        )
+        method, resolution = _GET_PARAMS(
+            {'method': method, 'resolution': resolution, **(step_run.params_json or {})}
+        )
 
-        # 建议3：方法选择提示
-        if method == 'louvain' and silhouette < 0.4:
-            suggestions.append({
-                'advice_type': 'method_suggestion',
-                'risk_level': 'low',
-                'title': '建议尝试 Leiden 聚类方法',
-                'description': 'Leiden 通常在单细胞聚类任务中表现更稳定，建议从 Louvain 切换到 Leiden。',
-                'evidence_text': f'当前方法 {method} 的轮廓系数 {silhouette:.2f} 一般，Leiden 常常提供更稳定的结果。',
-                'patch_json': {
-                    'method': 'leiden'
-                },
-                'patch_type': 'params'
-            })
+        return {
+            'method': method,
+            'resolution': resolution,
+            'silhouette': silhouette,
+            'n_clusters': n_clusters,
+        }
 
-        return suggestions
\ No newline at end of file
+    @classmethod
+    def analyze(cls, step_run) -> List[Suggestion]:
+        return evaluate(cls.RULES, cls.context(step_run))
@@ -0,0 +1,20 @@
+"""
+建议相关的共享字符串常量
+
+各分析器共用同一批驻留字符串，取值与 Advice 模型的 choices 保持一致。
+"""
+import sys
+from typing import Final
+
+# Advice.advice_type
+ADVICE_PARAM_OPT: Final = sys.intern('parameter_optimization')
+ADVICE_QUALITY: Final = sys.intern('quality_improvement')
+ADVICE_METHOD: Final = sys.intern('method_suggestion')
+
+# Advice.risk_level
+RISK_LOW: Final = sys.intern('low')
+RISK_MED: Final = sys.intern('medium')
+RISK_HIGH: Final = sys.intern('high')
+
+# Advice.patch_type
+PATCH_PARAMS: Final = sys.intern('params')
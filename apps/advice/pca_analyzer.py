@@ -5,64 +5,71 @@ PCA Advice Analyzer
 """
 from typing import Dict, List, Any
 
+from .constants import ADVICE_PARAM_OPT, RISK_LOW, RISK_MED
+from .rules import Rule, Suggestion, evaluate
+
+
+RULES = (
+    # 建议1：解释方差比例偏低，建议增加主成分数量
+    Rule(
+        predicate=lambda c: 0 < c['evr_sum'] < 0.6,
+        title='PCA解释方差偏低，建议增加主成分数量',
+        description='当前{n_components}个主成分仅解释了{evr_sum:.1%}的方差，建议增加到{target_up}个以捕获更多信息。',
+        evidence_text='PCA解释方差比例{evr_sum:.1%}低于推荐值60%，可能丢失重要的生物学信号。',
+        patch=lambda c: {
+            'n_components': c['target_up'],
+            'n_pcs': c['target_up']
+        },
+        advice_type=ADVICE_PARAM_OPT,
+        risk_level=RISK_MED,
+    ),
+    # 建议2：主成分数量过多且解释方差已足够
+    Rule(
+        predicate=lambda c: c['evr_sum'] > 0.85 and c['n_components'] > 40,
+        title='PCA主成分数量可以适度减少',
+        description='当前{n_components}个主成分已解释{evr_sum:.1%}的方差，可减少到{target_down}个以降低计算复杂度。',
+        evidence_text='PCA解释方差比例{evr_sum:.1%}已足够高，{n_components}个主成分可能过多。',
+        patch=lambda c: {
+            'n_components': c['target_down'],
+            'n_pcs': c['target_down']
+        },
+        advice_type=ADVICE_PARAM_OPT,
+        risk_level=RISK_LOW,
+    ),
+    # 建议3：标准建议，当解释方差在合理范围但可微调
+    Rule(
+        predicate=lambda c: 0.6 <= c['evr_sum'] <= 0.75 and c['n_components'] <= 25,
+        title='可考虑微调PCA主成分数量',
+        description='当前解释方差{evr_sum:.1%}在合理范围内，但可尝试增加到35个主成分以获得更好的下游效果。',
+        evidence_text='PCA解释方差{evr_sum:.1%}尚可，但略有提升空间。',
+        patch=lambda c: {
+            'n_components': 35,
+            'n_pcs': 35
+        },
+        advice_type=ADVICE_PARAM_OPT,
+        risk_level=RISK_LOW,
+    ),
+)
+
+
 class PCAAdviceAnalyzer:
     """PCA 分析结果的AI建议分析器"""
 
+    RULES = RULES
+
     @staticmethod
-    def analyze(step_run) -> List[Dict[str, Any]]:
+    def context(step_run) -> Dict[str, Any]:
         metrics = step_run.metrics_json or {}
         params = step_run.params_json or {}
 
-        suggestions: List[Dict[str, Any]] = []
-
         n_components = params.get('n_components', params.get('n_pcs', 30))
-        explained_variance_ratio_sum = metrics.get('explained_variance_ratio_sum', 0)
-
-        # 建议1：解释方差比例偏低，建议增加主成分数量
-        if explained_variance_ratio_sum > 0 and explained_variance_ratio_sum < 0.6:
-            target_components = min(50, n_components + 10)
-            suggestions.append({
-                'advice_type': 'parameter_optimization',
-                'risk_level': 'medium',
-                'title': 'PCA解释方差偏低，建议增加主成分数量',
-                'description': f'当前{n_components}个主成分仅解释了{explained_variance_ratio_sum:.1%}的方差，建议增加到{target_components}个以捕获更多信息。',
-                'evidence_text': f'PCA解释方差比例{explained_variance_ratio_sum:.1%}低于推荐值60%，可能丢失重要的生物学信号。',
-                'patch_json': {
-                    'n_components': target_components,
-                    'n_pcs': target_components
-                },
-                'patch_type': 'params'
-            })
-
-        # 建议2：主成分数量过多且解释方差已足够
-        if explained_variance_ratio_sum > 0.85 and n_components > 40:
-            target_components = max(20, int(n_components * 0.7))
-            suggestions.append({
-                'advice_type': 'parameter_optimization',
-                'risk_level': 'low',
-                'title': 'PCA主成分数量可以适度减少',
-                'description': f'当前{n_components}个主成分已解释{explained_variance_ratio_sum:.1%}的方差，可减少到{target_components}个以降低计算复杂度。',
-                'evidence_text': f'PCA解释方差比例{explained_variance_ratio_sum:.1%}已足够高，{n_components}个主成分可能过多。',
-                'patch_json': {
-                    'n_components': target_components,
-                    'n_pcs': target_components
-                },
-                'patch_type': 'params'
-            })
-
-        # 建议3：标准建议，当解释方差在合理范围但可微调
-        if 0.6 <= explained_variance_ratio_sum <= 0.75 and n_components <= 25:
-            suggestions.append({
-                'advice_type': 'parameter_optimization',
-                'risk_level': 'low',
-                'title': '可考虑微调PCA主成分数量',
-                'description': f'当前解释方差{explained_variance_ratio_sum:.1%}在合理范围内，但可尝试增加到35个主成分以获得更好的下游效果。',
-                'evidence_text': f'PCA解释方差{explained_variance_ratio_sum:.1%}尚可，但略有提升空间。',
-                'patch_json': {
-                    'n_components': 35,
-                    'n_pcs': 35
-                },
-                'patch_type': 'params'
-            })
+        return {
+            'n_components': n_components,
+            'evr_sum': metrics.get('explained_variance_ratio_sum', 0),
+            'target_up': min(50, n_components + 10),
+            'target_down': max(20, int(n_components * 0.7)),
+        }
 
-        return suggestions
\ No newline at end of file
+    @classmethod
+    def analyze(cls, step_run) -> List[Suggestion]:
+        return evaluate(cls.RULES, cls.context(step_run))
@@ -0,0 +1,50 @@
+"""
+建议规则引擎
+
+各步骤分析器以模块级 RULES 元组声明规则，由 evaluate 统一求值：
+predicate 判断是否命中，文案模板用 str.format_map 填充上下文，patch 生成参数补丁。
+"""
+from typing import Any, Callable, Dict, List, NamedTuple
+
+from .constants import PATCH_PARAMS
+
+
+class Suggestion(NamedTuple):
+    """规则命中后生成的一条建议，字段与 Advice 模型同名，可直接 Advice(**s._asdict())"""
+    advice_type: str
+    risk_level: str
+    title: str
+    description: str
+    evidence_text: str
+    patch_json: Dict[str, Any]
+    patch_type: str
+
+
+class Rule(NamedTuple):
+    """单条建议规则（不可变，模块加载时构建并在所有调用间共享）"""
+    predicate: Callable[[Dict[str, Any]], bool]
+    title: str
+    description: str
+    evidence_text: str
+    patch: Callable[[Dict[str, Any]], Dict[str, Any]]
+    advice_type: str
+    risk_level: str
+    patch_type: str = PATCH_PARAMS
+
+
+def evaluate(rules, ctx: Dict[str, Any]) -> List[Suggestion]:
+    """按顺序对上下文求值规则，返回命中规则生成的建议列表"""
+    suggestions: List[Suggestion] = []
+    for rule in rules:
+        if not rule.predicate(ctx):
+            continue
+        suggestions.append(Suggestion(
+            rule.advice_type,
+            rule.risk_level,
+            rule.title.format_map(ctx),
+            rule.description.format_map(ctx),
+            rule.evidence_text.format_map(ctx),
+            rule.patch(ctx),
+            rule.patch_type,
+        ))
+    return suggestions
@@ -3,65 +3,76 @@ UMAP Advice Analyzer
 
 为 UMAP 步骤提供智能建议
 """
+from operator import itemgetter
 from typing import Dict, List, Any
 
-class UMAPAdviceAnalyzer:
-    """UMAP 分析结果的AI建议分析器"""
+from .constants import ADVICE_PARAM_OPT, RISK_LOW, RISK_MED
+from .rules import Rule, Suggestion, evaluate
 
-    @staticmethod
-    def analyze(step_run) -> List[Dict[str, Any]]:
-        metrics = step_run.metrics_json or {}
-        params = step_run.params_json or {}
 
-        suggestions: List[Dict[str, Any]] = []
+RULES = (
+    # 建议1：全局结构保存较低，建议增大 n_neighbors
+    Rule(
+        predicate=lambda c: 0 < c['gsp'] < 0.5,
+        title='全局结构保持较差，建议增大 n_neighbors',
+        description='当前全局结构保持度 {gsp:.2f} 较低，增大邻居数有助于保留全局结构。',
+        evidence_text='global_structure_preservation={gsp:.2f} < 0.5',
+        patch=lambda c: {
+            'n_neighbors': min(50, max(c['n_neighbors'] + 10, 20))
+        },
+        advice_type=ADVICE_PARAM_OPT,
+        risk_level=RISK_MED,
+    ),
+    # 建议2：局部结构保存较低，建议减小 min_dist
+    Rule(
+        predicate=lambda c: 0 < c['lsp'] < 0.6,
+        title='局部结构保持一般，建议减小 min_dist',
+        description='当前局部结构保持度 {lsp:.2f} 一般，减小 min_dist 可增强类内紧凑性。',
+        evidence_text='local_structure_preservation={lsp:.2f} < 0.6',
+        patch=lambda c: {
+            'min_dist': max(0.05, c['min_dist'] * 0.5)
+        },
+        advice_type=ADVICE_PARAM_OPT,
+        risk_level=RISK_LOW,
+    ),
+    # 建议3：若两个指标都不错，但可微调
+    Rule(
+        predicate=lambda c: c['gsp'] >= 0.5 and c['lsp'] >= 0.8 and c['n_neighbors'] > 20,
+        title='UMAP表现良好，可略降 n_neighbors 提高分离度',
+        description='在保持全局与局部结构的前提下，适度降低 n_neighbors 有时能提升类间分离。',
+        evidence_text='GSP={gsp:.2f}, LSP={lsp:.2f} 均较好',
+        patch=lambda c: {
+            'n_neighbors': max(15, int(c['n_neighbors'] * 0.8))
+        },
+        advice_type=ADVICE_PARAM_OPT,
+        risk_level=RISK_LOW,
+    ),
+)
+
+# 一次解包读取指标/参数（缺省值预先合并），避免逐键 .get
+_METRICS_DEFAULTS = {'global_structure_preservation': 0, 'local_structure_preservation': 0}
+_GET_METRICS = itemgetter('global_structure_preservation', 'local_structure_preservation')
+_PARAMS_DEFAULTS = {'n_neighbors': 15, 'min_dist': 0.5}
+_GET_PARAMS = itemgetter('n_neighbors', 'min_dist')
 
-        n_neighbors = params.get('n_neighbors', 15)
-        min_dist = params.get('min_dist', 0.5)
-        gsp = metrics.get('global_structure_preservation', 0)
-        lsp = metrics.get('local_structure_preservation', 0)
 
-        # 建议1：全局结构保存较低，建议增大 n_neighbors
-        if gsp > 0 and gsp < 0.5:
-            target_neighbors = min(50, max(n_neighbors + 10, 20))
-            suggestions.append({
-                'advice_type': 'parameter_optimization',
-                'risk_level': 'medium',
-                'title': '全局结构保持较差，建议增大 n_neighbors',
-                'description': f'当前全局结构保持度 {gsp:.2f} 较低，增大邻居数有助于保留全局结构。',
-                'evidence_text': f'global_structure_preservation={gsp:.2f} < 0.5',
-                'patch_json': {
-                    'n_neighbors': target_neighbors
-                },
-                'patch_type': 'params'
-            })
+class UMAPAdviceAnalyzer:
+    """UMAP 分析结果的AI建议分析器"""
 
-        # 建议2：局部结构保存较低，建议减小 min_dist
-        if lsp > 0 and lsp < 0.6:
-            target_min_dist = max(0.05, min_dist * 0.5)
-            suggestions.append({
-                'advice_type': 'parameter_optimization',
-                'risk_level': 'low',
-                'title': '局部结构保持一般，建议减小 min_dist',
-                'description': f'当前局部结构保持度 {lsp:.2f} 一般，减小 min_dist 可增强类内紧凑性。',
-                'evidence_text': f'local_structure_preservation={lsp:.2f} < 0.6',
-                'patch_json': {
-                    'min_dist': target_min_dist
-                },
-                'patch_type': 'params'
-            })
+    RULES = RULES
+
+    @staticmethod
+    def context(step_run) -> Dict[str, Any]:
+        gsp, lsp = _GET_METRICS({**_METRICS_DEFAULTS, **(step_run.metrics_json or {})})
+        n_neighbors, min_dist = _GET_PARAMS({**_PARAMS_DEFAULTS, **(step_run.params_json or {})})
 
-        # 建议3：若两个指标都不错，但可微调
-        if gsp >= 0.5 and lsp >= 0.8 and n_neighbors > 20:
-            suggestions.append({
-                'advice_type': 'parameter_optimization',
-                'risk_level': 'low',
-                'title': 'UMAP表现良好，可略降 n_neighbors 提高分离度',
-                'description': '在保持全局与局部结构的前提下，适度降低 n_neighbors 有时能提升类间分离。',
-                'evidence_text': f'GSP={gsp:.2f}, LSP={lsp:.2f} 均较好',
-                'patch_json': {
-                    'n_neighbors': max(15, int(n_neighbors * 0.8))
-                },
-                'patch_type': 'params'
-            })
+        return {
+            'n_neighbors': n_neighbors,
+            'min_dist': min_dist,
+            'gsp': gsp,
+            'lsp': lsp,
+        }
 
-        return suggestions
\ No newline at end of file
+    @classmethod
+    def analyze(cls, step_run) -> List[Suggestion]:
+        return evaluate(cls.RULES, cls.context(step_run))
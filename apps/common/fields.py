@@ -0,0 +1,33 @@
+import orjson
+from django.db import models
+from django.db.models.fields.json import KeyTransform
+
+_DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class OrjsonField(models.JSONField):
+    """JSONField that encodes saved values and decodes loaded rows with orjson.
+
+    Only the save and load paths are replaced; lookups keep Django's own
+    encoding. Fields configured with a custom encoder/decoder, or values
+    orjson cannot encode, fall back to the stock JSONField behaviour.
+    """
+
+    def get_db_prep_save(self, value, connection):
+        if value is None or self.encoder is not None or hasattr(value, "as_sql"):
+            return super().get_db_prep_save(value, connection)
+        try:
+            return orjson.dumps(value, option=_DUMPS_OPTIONS).decode()
+        except orjson.JSONEncodeError:
+            return super().get_db_prep_save(value, connection)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or self.decoder is not None:
+            return super().from_db_value(value, expression, connection)
+        # Some backends (SQLite at least) return key transforms in their SQL types
+        if isinstance(expression, KeyTransform) and not isinstance(value, (str, bytes)):
+            return value
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            return value
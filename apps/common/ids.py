@@ -0,0 +1,19 @@
+import os
+import time
+import uuid
+
+
+def uuid7() -> uuid.UUID:
+    """Time-ordered UUID (RFC 9562 version 7).
+
+    48-bit unix milliseconds followed by random bits: new primary keys land
+    on the rightmost B-tree page instead of a random one, while staying
+    ordinary UUIDs for URLs, FKs and WebSocket group names.
+    """
+    ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (ms & 0xFFFF_FFFF_FFFF) << 80 | rand
+    # version 7 in bits 76-79, RFC variant (0b10) in bits 62-63
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)
@@ -1,8 +1,15 @@
+import re
 from typing import Optional
+from django.core.cache import cache
 from django.http import HttpRequest
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
 
-from apps.users.models import Organization
+from apps.users.models import Organization, UserProfile, USER_ORG_CACHE_KEY, USER_ORG_CACHE_TTL
+
+_UUID_RE = re.compile(
+    r"^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$"
+)
 
 
 class ActiveOrgMiddleware(MiddlewareMixin):
@@ -12,7 +19,8 @@ class ActiveOrgMiddleware(MiddlewareMixin):
       1) X-Org header (slug or UUID)
       2) ?org= query param (slug or UUID)
       3) authenticated user's profile.organization
-    Sets request.org to Organization or None.
+    Sets request.org to Organization or None, and request.user_organization_id
+    to the id (str) of the user's own organization (cached in the shared cache, USER_ORG_CACHE_TTL) or None.
     """
 
     def process_request(self, request: HttpRequest):
@@ -20,19 +28,72 @@ class ActiveOrgMiddleware(MiddlewareMixin):
         org = None
         if org_hint:
             # Try UUID match first, then fallback by name or slug
-            from uuid import UUID
-            try:
-                _ = UUID(org_hint)
-                org = Organization.objects.filter(id=org_hint).first()
-            except Exception:
-                # Treat as name or slug-like; prefer exact name match, then icontains
-                org = (
-                    Organization.objects.filter(name=org_hint).first()
-                    or Organization.objects.filter(name__iexact=org_hint).first()
-                )
-        if org is None and getattr(request, "user", None) and request.user.is_authenticated:
-            profile = getattr(request.user, "profile", None)
-            if profile and profile.organization_id:
-                org = profile.organization
-        request.org = org
-        return None 
\ No newline at end of file
+            orgs = Organization.objects.only("id", "name")
+            if _UUID_RE.match(org_hint):
+                org = orgs.filter(id=org_hint).first()
+            else:
+                # Treat as name or slug-like; iexact also covers the exact-name case
+                org = orgs.filter(name__iexact=org_hint).first()
+        user = getattr(request, "user", None)
+        if org is None and user and user.is_authenticated:
+            # Most requests never touch request.org; load the profile only on first access.
+            request.org = SimpleLazyObject(lambda: _profile_organization(user))
+        else:
+            request.org = org
+        request.user_organization_id = get_user_organization_id(user)
+        return None
+
+
+def _profile_organization(user) -> Optional[Organization]:
+    """The user's profile organization, with the profile cached on the user.
+
+    Users known (from the org-id cache) to have no organization skip the query.
+    """
+    if not get_user_organization_id(user):
+        return None
+    # One joined query for profile + organization; later request.user.profile
+    # .organization reads don't hit the DB again.
+    profile = (
+        UserProfile.objects.select_related("organization")
+        .filter(user_id=user.pk)
+        .first()
+    )
+    if profile is None:
+        return None
+    user.profile = profile
+    return profile.organization
+
+
+def get_user_organization_id(user) -> Optional[str]:
+    """Organization id (str) of the user's profile, cached for USER_ORG_CACHE_TTL.
+
+    Usable with any authenticated user, e.g. the DRF-authenticated (JWT) user
+    that the middleware itself never sees.
+    """
+    if not (user and user.is_authenticated):
+        return None
+    key = USER_ORG_CACHE_KEY.format(user.pk)
+    org_id = cache.get(key)
+    if org_id is None:
+        org_id = (
+            UserProfile.objects.filter(user_id=user.pk)
+            .values_list("organization_id", flat=True)
+            .first()
+        )
+        org_id = str(org_id) if org_id else ""
+        cache.set(key, org_id, USER_ORG_CACHE_TTL)
+    # "" caches users without an organization
+    return org_id or None
+
+
+def get_request_organization_id(request) -> Optional[str]:
+    """get_user_organization_id for request.user, memoized on the request.
+
+    A ViewSet may build its queryset several times per request (get_object,
+    permission checks, perform_create); the lookup runs once.
+    """
+    try:
+        return request._cached_org_id
+    except AttributeError:
+        request._cached_org_id = get_user_organization_id(getattr(request, "user", None))
+        return request._cached_org_id
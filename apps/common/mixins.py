@@ -0,0 +1,82 @@
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from apps.common.middleware import get_request_organization_id
+
+
+LIST_CACHE_VERSION_KEY = "list_version:{}"
+
+
+def _list_cache_version(user_pk) -> int:
+    return cache.get(LIST_CACHE_VERSION_KEY.format(user_pk)) or 0
+
+
+def invalidate_list_cache(user) -> None:
+    """Drop every cached list of ``user`` by bumping their list cache version.
+
+    Called after successful writes, so the list the UI refetches right after
+    a create/rename/delete reflects the change instead of lagging by the TTL.
+    """
+    if not (user and user.is_authenticated):
+        return
+    key = LIST_CACHE_VERSION_KEY.format(user.pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No version yet; add() keeps a concurrent first bump from being lost.
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+class CachedListMixin:
+    """Short-TTL per-user cache for the ``list`` action of a ViewSet.
+
+    Dashboard polling repeats the same GET within seconds; the serialized
+    payload is cached per user and full path (query string included) so the
+    repeats skip the queryset and serializer. Responses are marked
+    ``Cache-Control: private`` so only the client itself may reuse them.
+    The key also carries a per-user version that every successful write
+    through the ViewSet bumps (see ``invalidate_list_cache``), so a user's
+    own changes show up on the next list request.
+    """
+
+    list_cache_ttl = 5  # seconds
+
+    def list(self, request, *args, **kwargs):
+        version = _list_cache_version(request.user.pk)
+        key = f"list:{type(self).__name__}:{request.user.pk}:{version}:{request.get_full_path()}"
+        data = cache.get(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            cache.set(key, response.data, self.list_cache_ttl)
+        else:
+            response = Response(data)
+        patch_cache_control(response, private=True, max_age=self.list_cache_ttl)
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Covers create/update/destroy as well as custom write actions (pause, fork, ...)
+        if request.method not in SAFE_METHODS and 200 <= response.status_code < 300:
+            invalidate_list_cache(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class OrgScopedQuerysetMixin:
+    """Restrict a ViewSet's queryset to the requesting user's organization.
+
+    ``org_lookup`` is the lookup path from the model to its denormalized
+    ``organization_id``. Users without an organization see the unfiltered
+    queryset, as before. The organization id is resolved once per request.
+    """
+
+    org_lookup = "organization_id"
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        org_id = get_request_organization_id(self.request)
+        if org_id:
+            qs = qs.filter(**{self.org_lookup: org_id})
+        return qs
@@ -2,27 +2,63 @@ from rest_framework.permissions import BasePermission, SAFE_METHODS
 from apps.users.models import UserProfile, Organization, Membership
 
 
+def _membership_role(request):
+    """Return request.user's role in request.org (None if not a member), memoized per request.
+
+    DRF evaluates several permission classes (and object permissions) for one
+    request; they all share this single-column lookup so the row is fetched at most once.
+    """
+    user = getattr(request, "user", None)
+    org = getattr(request, "org", None)
+    if not (user and user.is_authenticated and org):
+        return None
+    key = (user.pk, org.pk)
+    cached = getattr(request, "_cached_membership_role", None)
+    if cached is not None and cached[:2] == key:
+        return cached[2]
+    role = (
+        Membership.objects.filter(user=user, organization=org)
+        .values_list("role", flat=True)
+        .first()
+    )
+    request._cached_membership_role = (*key, role)
+    return role
+
+
+def _resolve_role(request):
+    """Role of request.user in the active org, falling back to the legacy profile role."""
+    role = _membership_role(request)
+    if role:
+        return role
+    # Fallback to profile role (legacy)
+    try:
+        return request.user.profile.role
+    except Exception:
+        return None
+
+
+def _build_allowed(method_to_capability, role_matrix):
+    """Flatten capability mappings into a frozenset of permitted (role, method) pairs."""
+    return frozenset(
+        (role, method)
+        for role, caps in role_matrix.items()
+        for method, cap in method_to_capability.items()
+        if cap in caps
+    )
+
+
 class IsOrgMember(BasePermission):
     """Require that request.user is authenticated and has a membership in request.org."""
 
     def has_permission(self, request, view):
-        user = getattr(request, "user", None)
-        org = getattr(request, "org", None)
-        if not (user and user.is_authenticated and org):
-            return False
-        return Membership.objects.filter(user=user, organization=org).exists()
+        return _membership_role(request) is not None
 
 
 class IsOrgAdminOrOwner(BasePermission):
     """Require that the user has admin or owner role in the active organization."""
 
     def has_permission(self, request, view):
-        user = getattr(request, "user", None)
-        org = getattr(request, "org", None)
-        if not (user and user.is_authenticated and org):
-            return False
-        mem = Membership.objects.filter(user=user, organization=org).first()
-        return mem and mem.role in ("owner", "admin")
+        return _membership_role(request) in ("owner", "admin")
 
     def has_object_permission(self, request, view, obj):
         return self.has_permission(request, view)
@@ -54,28 +90,15 @@ class RBACByRole(BasePermission):
         "viewer": {"view"},
     }
 
+    _allowed = _build_allowed(method_to_capability, role_matrix)
+
     def _resolve_role(self, request):
-        org = getattr(request, "org", None)
-        user = getattr(request, "user", None)
-        if org and user and user.is_authenticated:
-            m = Membership.objects.filter(user=user, organization=org).first()
-            if m:
-                return m.role
-        # Fallback to profile role (legacy)
-        try:
-            return request.user.profile.role
-        except Exception:
-            return None
+        return _resolve_role(request)
 
     def has_permission(self, request, view):
         if request.method in SAFE_METHODS:
             return True
-        role = self._resolve_role(request)
-        if not role:
-            return False
-        need = self.method_to_capability.get(request.method, "view")
-        allowed = self.role_matrix.get(role, set())
-        return need in allowed 
+        return (self._resolve_role(request), request.method) in self._allowed
 
 
 class SessionRBAC(BasePermission):
@@ -86,20 +109,19 @@ class SessionRBAC(BasePermission):
     - Other methods: same mapping as RBACByRole
     """
 
+    # DELETE is mapped to 'edit' for sessions, other methods follow RBACByRole
+    _allowed = _build_allowed(
+        {**RBACByRole.method_to_capability, "DELETE": "edit"},
+        RBACByRole.role_matrix,
+    )
+
     def _resolve_role(self, request):
-        # Reuse RBACByRole's role resolution
-        return RBACByRole()._resolve_role(request)
+        return _resolve_role(request)
 
     def has_permission(self, request, view):
         if request.method in SAFE_METHODS:
             return True
-        role = self._resolve_role(request)
-        if not role:
-            return False
-        # DELETE is mapped to 'edit' for sessions, other methods follow RBACByRole
-        need = "edit" if request.method == "DELETE" else RBACByRole.method_to_capability.get(request.method, "view")
-        allowed = RBACByRole.role_matrix.get(role, set())
-        return need in allowed
+        return (self._resolve_role(request), request.method) in self._allowed
 
 
 class ProjectRBAC(BasePermission):
@@ -110,17 +132,16 @@ class ProjectRBAC(BasePermission):
     - Other methods: same mapping as RBACByRole
     """
 
+    # DELETE is mapped to 'edit' for projects, other methods follow RBACByRole
+    _allowed = _build_allowed(
+        {**RBACByRole.method_to_capability, "DELETE": "edit"},
+        RBACByRole.role_matrix,
+    )
+
     def _resolve_role(self, request):
-        # Reuse RBACByRole's role resolution
-        return RBACByRole()._resolve_role(request)
+        return _resolve_role(request)
 
     def has_permission(self, request, view):
         if request.method in SAFE_METHODS:
             return True
-        role = self._resolve_role(request)
-        if not role:
-            return False
-        # DELETE is mapped to 'edit' for projects, other methods follow RBACByRole
-        need = "edit" if request.method == "DELETE" else RBACByRole.method_to_capability.get(request.method, "view")
-        allowed = RBACByRole.role_matrix.get(role, set())
-        return need in allowed
\ No newline at end of file
+        return (self._resolve_role(request), request.method) in self._allowed
\ No newline at end of file
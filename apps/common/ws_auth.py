@@ -1,6 +1,8 @@
-from urllib.parse import parse_qs
-from typing import Callable, Awaitable
+import time
+from urllib.parse import unquote_plus
+from typing import Callable, Awaitable, Dict, Optional, Tuple
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
@@ -10,28 +12,76 @@ try:
 except Exception:
     JWTAuthentication = None
 
+# token -> (user_id, expires_at). Reconnecting clients reuse the validated
+# result instead of re-verifying the signature; entries never outlive the token.
+_TOKEN_CACHE: Dict[str, Tuple[object, float]] = {}
+_TOKEN_CACHE_TTL = 60
+_TOKEN_CACHE_MAXSIZE = 10_000
+
+
+def _cached_user_id(token: str):
+    entry = _TOKEN_CACHE.get(token)
+    if entry is None:
+        return None
+    user_id, expires_at = entry
+    if expires_at <= time.time():
+        _TOKEN_CACHE.pop(token, None)
+        return None
+    return user_id
+
+
+def _cache_user_id(token: str, user_id, token_exp) -> None:
+    expires_at = time.time() + _TOKEN_CACHE_TTL
+    if token_exp:
+        expires_at = min(expires_at, float(token_exp))
+    if len(_TOKEN_CACHE) >= _TOKEN_CACHE_MAXSIZE:
+        # Drop the oldest entry (dicts keep insertion order)
+        _TOKEN_CACHE.pop(next(iter(_TOKEN_CACHE)), None)
+    _TOKEN_CACHE[token] = (user_id, expires_at)
+
 
 @database_sync_to_async
 def get_user_from_jwt(token: str):
     if not JWTAuthentication:
         return AnonymousUser()
+    user_id = _cached_user_id(token)
+    if user_id is not None:
+        # Only the columns WebSocket consumers read; the signature check is what the cache skips
+        user = get_user_model().objects.only("id", "username", "is_active").filter(pk=user_id, is_active=True).first()
+        return user or AnonymousUser()
     authenticator = JWTAuthentication()
     try:
         validated = authenticator.get_validated_token(token)
         user = authenticator.get_user(validated)
+        _cache_user_id(token, user.pk, validated.get("exp"))
         return user
     except Exception:
         return AnonymousUser()
 
 
+def _extract_token(qs: bytes) -> Optional[str]:
+    """Return the first non-empty ``token`` value from a raw query string.
+
+    Only the token substring is decoded; other parameters are never parsed.
+    """
+    start = 0
+    while True:
+        idx = qs.find(b"token=", start)
+        if idx == -1:
+            return None
+        # Must be a whole key, not the tail of e.g. "csrftoken="
+        if idx == 0 or qs[idx - 1] == 0x26:  # b"&"
+            end = qs.find(b"&", idx)
+            raw = qs[idx + 6:] if end == -1 else qs[idx + 6:end]
+            if raw:
+                return unquote_plus(raw.decode())
+        start = idx + 6
+
+
 class JWTAuthMiddleware(BaseMiddleware):
     async def __call__(self, scope, receive, send):
-        query = parse_qs(scope.get("query_string", b"").decode())
-        token = None
-        if "token" in query:
-            token_vals = query.get("token")
-            token = token_vals[0] if token_vals else None
+        token = _extract_token(scope.get("query_string", b""))
         if token:
             user = await get_user_from_jwt(token)
             scope["user"] = user
-        return await super().__call__(scope, receive, send) 
\ No newline at end of file
+        return await super().__call__(scope, receive, send)
@@ -1,39 +1,56 @@
-import json
+import uuid
+import orjson
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 
-from .models import StepRun, Step, Session
+from apps.common.ids import uuid7
+from .models import Step, Session
 from .tasks import run_step
 
 @require_http_methods(["POST"])
 @login_required
 def trigger_run(request):
-    """Create a StepRun and dispatch Celery task (authenticated)"""
-    data = json.loads(request.body or '{}')
+    """Dispatch a Celery task that creates and executes the StepRun (authenticated)"""
+    data = orjson.loads(request.body) if request.body else {}
     session_id = data.get('session')
     step_id = data.get('step')
     params = data.get('params', {})
 
-    session = get_object_or_404(Session, id=session_id)
-    step = get_object_or_404(Step, id=step_id)
+    # 先在 Python 中校验 ID 格式，非法请求不访问数据库
+    try:
+        session_uuid = uuid.UUID(str(session_id))
+        step_uuid = uuid.UUID(str(step_id))
+    except ValueError:
+        return JsonResponse({'detail': 'Invalid id'}, status=400)
+
+    # Session 冗余了 organization_id，租户校验无需 JOIN dataset/project
+    session = get_object_or_404(Session.objects.only('id', 'organization_id'), id=session_uuid)
+    step = get_object_or_404(Step.objects.only('id'), id=step_uuid)
 
     # Basic tenant isolation: ensure session belongs to user's org if set
-    profile = getattr(request.user, 'profile', None)
-    if profile and profile.organization and getattr(session.dataset.project, 'organization_id', None):
-        if str(profile.organization.id) != str(session.dataset.project.organization_id):
+    # (user_organization_id is resolved from cache by ActiveOrgMiddleware)
+    user_org_id = getattr(request, 'user_organization_id', None)
+    if user_org_id and session.organization_id:
+        if user_org_id != session.organization_id:
             return JsonResponse({'detail': 'Forbidden'}, status=403)
 
-    run = StepRun.objects.create(session=session, step=step, params_json=params, status='PENDING')
-    # Dispatch Celery
-    run_step.delay(str(run.id))
+    # StepRun 由 worker 创建：请求线程只投递消息，ID 预先生成以便立即返回 ws_url
+    run_id = uuid7()
+    run_step.apply_async(
+        args=[str(run_id)],
+        kwargs={'session_id': str(session.id), 'step_id': str(step.id), 'params': params},
+        task_id=str(run_id),
+    )
 
-    return JsonResponse({
-        'id': str(run.id),
-        'status': run.status,
-        'ws_url': f'ws://{request.get_host()}/ws/tasks/{run.id}',
-        'created_at': run.created_at.isoformat(),
-    }, status=202)
\ No newline at end of file
+    # orjson 直接序列化 UUID/datetime，预编码后以 HttpResponse 返回
+    payload = {
+        'id': run_id,
+        'status': 'PENDING',
+        'ws_url': f'ws://{request.get_host()}/ws/tasks/{run_id}',
+        'created_at': timezone.now(),
+    }
+    return HttpResponse(orjson.dumps(payload), content_type='application/json', status=202)
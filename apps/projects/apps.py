@@ -1,4 +1,51 @@
 from django.apps import AppConfig
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_migrate
+
+
+# 默认分析步骤定义（模块加载时构建一次，migrate 后写入）
+DEFAULT_STEPS = (
+    {
+        'step_type': 'qc',
+        'name': 'Quality Control',
+        'description': 'Filter cells/genes, compute mito/ribo metrics',
+        'runner_image': 'bioai/runner:latest',
+        'runner_command': 'python run_qc.py --params ${params_json}',
+        'default_params': {'min_genes': 200, 'max_genes': 5000, 'max_mito': 0.1},  # max_mito 为比例
+    },
+    {
+        'step_type': 'hvg',
+        'name': 'Highly Variable Genes',
+        'description': 'Detect highly variable genes',
+        'runner_image': 'bioai/runner:latest',
+        'runner_command': 'python run_hvg.py --params ${params_json}',
+        'default_params': {'method': 'seurat_v3', 'n_top_genes': 2000, 'subset_to_hvg': True},
+    },
+    {
+        'step_type': 'pca',
+        'name': 'PCA',
+        'description': 'Reduce dimensionality',
+        'runner_image': 'bioai/runner:latest',
+        'runner_command': 'python run_pca.py --params ${params_json}',
+        'default_params': {'n_pcs': 30},
+    },
+    {
+        'step_type': 'umap',
+        'name': 'UMAP',
+        'description': '2D embedding',
+        'runner_image': 'bioai/runner:latest',
+        'runner_command': 'python run_umap.py --params ${params_json}',
+        'default_params': {'min_dist': 0.3},
+    },
+    {
+        'step_type': 'clustering',
+        'name': 'Clustering',
+        'description': 'Leiden clustering',
+        'runner_image': 'bioai/runner:latest',
+        'runner_command': 'python run_cluster.py --params ${params_json}',
+        'default_params': {'resolution': 0.8},
+    },
+)
 
 
 class ProjectsConfig(AppConfig):
@@ -7,58 +54,11 @@ class ProjectsConfig(AppConfig):
     verbose_name = 'Projects & Analysis'
 
     def ready(self):
-        # Lazy import to avoid AppRegistryNotReady
-        try:
-            from django.db.utils import OperationalError, ProgrammingError
-            from .models import Step
-            default_steps = [
-                {
-                    'step_type': 'qc',
-                    'name': 'Quality Control',
-                    'description': 'Filter cells/genes, compute mito/ribo metrics',
-                    'runner_image': 'bioai/runner:latest',
-                    'runner_command': 'python run_qc.py --params ${params_json}',
-                    'default_params': {'min_genes': 200, 'max_genes': 5000, 'max_mito': 10},
-                },
-                {
-                    'step_type': 'hvg',
-                    'name': 'Highly Variable Genes',
-                    'description': 'Detect highly variable genes',
-                    'runner_image': 'bioai/runner:latest',
-                    'runner_command': 'python run_hvg.py --params ${params_json}',
-                    'default_params': {'method': 'seurat_v3', 'n_top_genes': 2000},
-                },
-                {
-                    'step_type': 'pca',
-                    'name': 'PCA',
-                    'description': 'Reduce dimensionality',
-                    'runner_image': 'bioai/runner:latest',
-                    'runner_command': 'python run_pca.py --params ${params_json}',
-                    'default_params': {'n_pcs': 30},
-                },
-                {
-                    'step_type': 'umap',
-                    'name': 'UMAP',
-                    'description': '2D embedding',
-                    'runner_image': 'bioai/runner:latest',
-                    'runner_command': 'python run_umap.py --params ${params_json}',
-                    'default_params': {'min_dist': 0.3},
-                },
-                {
-                    'step_type': 'clustering',
-                    'name': 'Clustering',
-                    'description': 'Leiden clustering',
-                    'runner_image': 'bioai/runner:latest',
-                    'runner_command': 'python run_cluster.py --params ${params_json}',
-                    'default_params': {'resolution': 0.8},
-                },
-            ]
-            # Seed only when table exists and empty
-            if Step.objects.count() == 0:
-                Step.objects.bulk_create([Step(**s) for s in default_steps])
-        except (OperationalError, ProgrammingError):
-            # Database not ready or table missing during migration/collectstatic
-            pass
-        except Exception:
-            # Avoid crashing app on seeding issues
-            pass
\ No newline at end of file
+        # Seed after migrate instead of on every boot: ready() does no DB work
+        post_migrate.connect(seed_default_steps, sender=self)
+
+
+def seed_default_steps(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Idempotent seed: step_type is unique, existing rows are left untouched"""
+    from .models import Step  # models are not importable at apps.py import time
+    Step.objects.using(using).bulk_create([Step(**s) for s in DEFAULT_STEPS], ignore_conflicts=True)
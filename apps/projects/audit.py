@@ -0,0 +1,136 @@
+"""
+审计日志缓冲写入
+
+请求线程只把日志 RPUSH 到 Redis 列表（不占用数据库往返），
+由 Celery beat 周期任务 projects.flush_audit_logs 批量 bulk_create 落库。
+开发环境（CELERY_TASK_ALWAYS_EAGER，无 beat）或 Redis 不可用时退回同步写入。
+
+落库前先把一批日志原子地移入处理中列表，写库成功后才删除：数据库不可用时日志留在
+处理中列表，下次 flush 重试（记录 id 在入队时生成，重试幂等）；单条无法写入的坏数据
+转入死信列表并记录日志，任何情况下都不静默丢弃审计记录。
+"""
+import logging
+
+import orjson
+import redis
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+
+from apps.common.ids import uuid7
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDIT_BUFFER_KEY = 'audit_log_buffer'
+AUDIT_PROCESSING_KEY = 'audit_log_processing'
+AUDIT_DEAD_LETTER_KEY = 'audit_log_dead'
+AUDIT_FLUSH_LOCK_KEY = 'audit_log_flush_lock'
+FLUSH_LOCK_SECONDS = 300
+FLUSH_BATCH_SIZE = 500
+
+_client = None
+
+
+def _get_redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+    return _client
+
+
+def record_audit(user, action_type, object_type, object_id, changes=None, metadata=None,
+                 ip_address=None, user_agent=''):
+    """记录一条审计日志（缓冲写入，最终一致）"""
+    if object_id is None:
+        # object_id 非空，这类记录本就无法落库
+        return
+    entry = {
+        'id': uuid7(),  # 入队时确定主键，flush 重试时不会重复写入
+        'user_id': user.pk if user is not None else None,
+        'timestamp': timezone.now(),
+        'action_type': action_type,
+        'object_type': object_type,
+        'object_id': object_id,
+        'changes': changes or {},
+        'metadata': metadata or {},
+        'ip_address': ip_address,
+        'user_agent': user_agent or '',
+    }
+    if not getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        try:
+            _get_redis().rpush(AUDIT_BUFFER_KEY, orjson.dumps(entry))
+            return
+        except redis.RedisError:
+            pass
+    AuditLog.objects.create(**entry)
+
+
+def _claim_batch(client) -> list:
+    """取本批待写日志：优先取上次未完成的处理中列表，否则从缓冲列表原子移入一批"""
+    pending = client.lrange(AUDIT_PROCESSING_KEY, 0, -1)
+    if pending:
+        return pending
+    with client.pipeline(transaction=True) as pipe:
+        for _ in range(FLUSH_BATCH_SIZE):
+            pipe.lmove(AUDIT_BUFFER_KEY, AUDIT_PROCESSING_KEY, 'LEFT', 'RIGHT')
+        return [item for item in pipe.execute() if item is not None]
+
+
+def _write_batch(client, raw: list) -> int:
+    """写入一批日志，返回写入条数；数据库不可用时抛出 DatabaseError（批次留在处理中列表）"""
+    objs = [AuditLog(**orjson.loads(item)) for item in raw]
+    try:
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(objs, batch_size=FLUSH_BATCH_SIZE, ignore_conflicts=True)
+        return len(objs)
+    except DatabaseError:
+        logger.warning('Audit log batch insert failed, retrying row by row', exc_info=True)
+    # 逐条重试：定位坏数据转入死信；连接类错误直接上抛，整批留待下次重试
+    written = 0
+    for item, obj in zip(raw, objs):
+        try:
+            with transaction.atomic():
+                obj.save(force_insert=True)
+            written += 1
+        except IntegrityError:
+            # 主键冲突即此前已写入（重试场景），其余完整性错误视为坏数据
+            if AuditLog.objects.filter(pk=obj.pk).exists():
+                continue
+            logger.error('Audit log entry rejected, moved to %s: %s', AUDIT_DEAD_LETTER_KEY, item, exc_info=True)
+            client.rpush(AUDIT_DEAD_LETTER_KEY, item)
+        except DatabaseError:
+            raise
+        except Exception:
+            logger.error('Audit log entry rejected, moved to %s: %s', AUDIT_DEAD_LETTER_KEY, item, exc_info=True)
+            client.rpush(AUDIT_DEAD_LETTER_KEY, item)
+    return written
+
+
+def flush_buffer(max_batches: int = 20) -> int:
+    """从 Redis 取出缓冲日志批量落库，返回写入条数
+
+    同一时刻只允许一个 flush 运行（Redis 锁）；数据库不可用时本批留在处理中列表，下次重试。
+    """
+    client = _get_redis()
+    if not client.set(AUDIT_FLUSH_LOCK_KEY, 1, nx=True, ex=FLUSH_LOCK_SECONDS):
+        return 0
+    written = 0
+    try:
+        for _ in range(max_batches):
+            raw = _claim_batch(client)
+            if not raw:
+                break
+            try:
+                written += _write_batch(client, raw)
+            except DatabaseError:
+                logger.error('Audit log flush failed, %d entries kept in %s for retry',
+                             len(raw), AUDIT_PROCESSING_KEY, exc_info=True)
+                break
+            client.delete(AUDIT_PROCESSING_KEY)
+            if len(raw) < FLUSH_BATCH_SIZE:
+                break
+    finally:
+        client.delete(AUDIT_FLUSH_LOCK_KEY)
+    return written
@@ -0,0 +1,41 @@
+"""
+列表查询参数解析
+
+Dataset/Session/StepRun 的 get_queryset 共用同一组查询参数，请求内一次性解析为只读数据类，
+各视图按需读取属性，不再逐个 query_params.get 与重复拆分 tags。
+"""
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+_TRUTHY = frozenset(('true', '1', 'yes'))
+
+
+@dataclass(frozen=True, slots=True)
+class ListFilters:
+    q: Optional[str]
+    tags: Tuple[str, ...]
+    status: Optional[str]
+    created_after: Optional[str]
+    created_before: Optional[str]
+    project: Optional[str]
+    dataset: Optional[str]
+    step_type: Optional[str]
+    pinned: bool
+    since: Optional[str]
+
+
+def parse_list_filters(query_params) -> ListFilters:
+    """从 request.query_params 解析列表过滤参数；空字符串视为未提供"""
+    get = query_params.get
+    return ListFilters(
+        q=get('q') or None,
+        tags=tuple(filter(None, map(str.strip, (get('tags') or '').split(',')))),
+        status=get('status') or None,
+        created_after=get('created_after') or None,
+        created_before=get('created_before') or None,
+        project=get('project') or None,
+        dataset=get('dataset') or None,
+        step_type=get('step_type') or None,
+        pinned=get('pinned') in _TRUTHY,
+        since=get('since') or None,
+    )
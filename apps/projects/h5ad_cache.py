@@ -0,0 +1,74 @@
+"""
+输入 H5AD 本地缓存（按 worker 主机共享）
+
+同一对象在参数调整后的重跑、或多个下游步骤读取同一数据集输入时会被反复下载。
+这里以 (key, ETag) 为键把对象整文件缓存到本地磁盘：命中时只需一次 HEAD 校验 ETag，
+无需重新下载；缓存总大小超过上限时按最近使用时间（mtime）淘汰。
+缓存放在磁盘而非进程内，prefork 子进程回收后（max_tasks_per_child）仍可复用。
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+from django.conf import settings
+
+from apps.steps.runners._s3util import get_transfer_config, object_key
+
+CACHE_DIR = getattr(settings, 'H5AD_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'cellinsight_cache'))
+CACHE_MAX_BYTES = getattr(settings, 'H5AD_CACHE_MAX_BYTES', 20 * 1024 ** 3)
+# 最近被使用过的文件可能正由其他 worker 读取，淘汰时跳过
+EVICT_GRACE_SECONDS = 600
+
+
+def get_local_path(s3, s3_path: str) -> str:
+    """返回对象的本地缓存路径（必要时下载），调用方只读使用该文件"""
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    key = object_key(s3_path)
+    etag = s3.head_object(Bucket=bucket, Key=key)['ETag'].strip('"')
+    digest = hashlib.sha1(f'{bucket}/{key}'.encode()).hexdigest()
+    path = os.path.join(CACHE_DIR, f'{digest}.{etag}')
+    if os.path.exists(path):
+        os.utime(path)  # 刷新最近使用时间
+        return path
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.part')
+    os.close(fd)
+    try:
+        s3.download_file(bucket, key, tmp_path, Config=get_transfer_config())
+        os.replace(tmp_path, path)  # 原子落位，并发下载同一对象也安全
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _evict(keep=path)
+    return path
+
+
+def _evict(keep: str) -> None:
+    """缓存超过上限时删除最久未使用的文件"""
+    entries = []
+    total = 0
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith('.part'):
+            continue
+        full = os.path.join(CACHE_DIR, name)
+        try:
+            st = os.stat(full)
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, full))
+        total += st.st_size
+    if total <= CACHE_MAX_BYTES:
+        return
+    cutoff = time.time() - EVICT_GRACE_SECONDS
+    for mtime, size, full in sorted(entries):
+        if total <= CACHE_MAX_BYTES:
+            break
+        if full == keep or mtime > cutoff:
+            continue
+        try:
+            os.remove(full)
+            total -= size
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-16 10:41
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def dedupe_step_types(apps, schema_editor):
+    """每个 step_type 只保留最早创建的 Step；指向重复行的外键改指向保留行后删除重复行"""
+    Step = apps.get_model('projects', 'Step')
+    duplicated = (
+        Step.objects.values('step_type').annotate(n=Count('id')).filter(n__gt=1).values_list('step_type', flat=True)
+    )
+    # 所有指向 Step 的外键（StepRun.step、Session.current_step 等）
+    relations = [
+        (rel.related_model, rel.field.name)
+        for rel in Step._meta.related_objects
+        if rel.one_to_many or rel.one_to_one
+    ]
+    for step_type in list(duplicated):
+        ids = list(Step.objects.filter(step_type=step_type).order_by('created_at', 'id').values_list('id', flat=True))
+        keep, drop = ids[0], ids[1:]
+        for model, field_name in relations:
+            model.objects.filter(**{f'{field_name}__in': drop}).update(**{field_name: keep})
+        Step.objects.filter(id__in=drop).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_remove_steprun_sample_alter_project_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_step_types, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='step',
+            name='step_type',
+            field=models.CharField(choices=[('qc', 'Quality Control'), ('normalization', 'Normalization'), ('hvg', 'Highly Variable Genes'), ('pca', 'Principal Component Analysis'), ('umap', 'UMAP Embedding'), ('clustering', 'Clustering'), ('batch_correction', 'Batch Correction'), ('annotation', 'Cell Type Annotation'), ('differential', 'Differential Expression')], max_length=20, unique=True),
+        ),
+    ]
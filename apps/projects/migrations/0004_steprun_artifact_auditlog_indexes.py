@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-16 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_alter_step_step_type'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='steprun',
+            index=models.Index(fields=['session', '-created_at'], name='steprun_session_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='steprun',
+            index=models.Index(fields=['status'], name='steprun_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='steprun',
+            index=models.Index(fields=['session', 'order_index'], name='steprun_session_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artifact',
+            index=models.Index(fields=['step_run', '-created_at'], name='artifact_run_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['object_type', 'object_id', '-timestamp'], name='auditlog_object_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', '-timestamp'], name='auditlog_user_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-16 11:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_organization_id(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    Dataset = apps.get_model('projects', 'Dataset')
+    Session = apps.get_model('projects', 'Session')
+    Dataset.objects.update(
+        organization_id=Subquery(
+            Project.objects.filter(id=OuterRef('project_id')).values('organization_id')[:1]
+        )
+    )
+    Session.objects.update(
+        organization_id=Subquery(
+            Dataset.objects.filter(id=OuterRef('dataset_id')).values('organization_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_steprun_artifact_auditlog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='organization_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='organization_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.RunPython(backfill_organization_id, migrations.RunPython.noop),
+    ]
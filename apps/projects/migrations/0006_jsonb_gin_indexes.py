@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-16 12:05
+
+from django.db import migrations
+
+
+# GIN 索引仅 PostgreSQL 支持；开发环境可能使用 SQLite（DJANGO_DB_ENGINE=sqlite），此时跳过
+GIN_INDEXES = (
+    ('steprun_params_json_gin', 'projects_steprun', 'params_json', ''),
+    ('steprun_metrics_json_gin', 'projects_steprun', 'metrics_json', ''),
+    ('auditlog_changes_gin', 'projects_auditlog', 'changes', ' jsonb_path_ops'),
+)
+
+
+def create_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column, opclass in GIN_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" USING gin ("{column}"{opclass})'
+        )
+
+
+def drop_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _table, _column, _opclass in GIN_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_dataset_session_organization_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_indexes, drop_gin_indexes),
+    ]
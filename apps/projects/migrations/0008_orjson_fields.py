@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-16 12:50
+
+import apps.common.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_time_ordered_uuid_pks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='steprun',
+            name='params_json',
+            field=apps.common.fields.OrjsonField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name='steprun',
+            name='metrics_json',
+            field=apps.common.fields.OrjsonField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='steprun',
+            name='evidence_json',
+            field=apps.common.fields.OrjsonField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='advice',
+            name='patch_json',
+            field=apps.common.fields.OrjsonField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='changes',
+            field=apps.common.fields.OrjsonField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-16 14:10
+
+from django.db import migrations
+
+
+# tags 仍为 JSONField（需兼容 SQLite），在 PostgreSQL 上用 jsonb_path_ops GIN 索引支撑 tags__contains（@>）
+TAG_GIN_INDEXES = (
+    ('project_tags_gin', 'projects_project'),
+    ('dataset_tags_gin', 'projects_dataset'),
+    ('session_tags_gin', 'projects_session'),
+)
+
+
+def create_tag_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in TAG_GIN_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" USING gin ("tags" jsonb_path_ops)'
+        )
+
+
+def drop_tag_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _table in TAG_GIN_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_alter_auditlog_timestamp'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_tag_indexes, drop_tag_indexes),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-16 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0010_tags_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='steprun',
+            index=models.Index(fields=['session', 'status', '-created_at'], name='steprun_sess_status_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artifact',
+            index=models.Index(fields=['step_run', 'artifact_type'], name='artifact_run_type_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-16 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0011_steprun_artifact_input_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='advice',
+            index=models.Index(fields=['step_run', '-created_at'], name='advice_run_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp'], name='auditlog_ts_idx'),
+        ),
+    ]
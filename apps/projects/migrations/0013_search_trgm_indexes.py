@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-16 16:40
+
+from django.db import migrations
+
+
+# q 搜索使用 icontains（PostgreSQL 上为 UPPER(col) LIKE UPPER(%q%)），B-tree 无法支撑前导通配；
+# 在 PostgreSQL 上为被搜索列建 pg_trgm GIN 表达式索引，SQLite 跳过
+SEARCH_TRGM_INDEXES = (
+    ('dataset_name_trgm', 'projects_dataset', 'name'),
+    ('dataset_notes_trgm', 'projects_dataset', 'notes'),
+    ('session_name_trgm', 'projects_session', 'name'),
+    ('session_description_trgm', 'projects_session', 'description'),
+)
+
+
+def create_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in SEARCH_TRGM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _table, _column in SEARCH_TRGM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0012_advice_auditlog_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trgm_indexes, drop_trgm_indexes),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.6 on 2026-10-16 18:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_organization_id(apps, schema_editor):
+    Session = apps.get_model('projects', 'Session')
+    StepRun = apps.get_model('projects', 'StepRun')
+    Artifact = apps.get_model('projects', 'Artifact')
+    Advice = apps.get_model('projects', 'Advice')
+    StepRun.objects.update(
+        organization_id=Subquery(
+            Session.objects.filter(id=OuterRef('session_id')).values('organization_id')[:1]
+        )
+    )
+    run_org = Subquery(
+        StepRun.objects.filter(id=OuterRef('step_run_id')).values('organization_id')[:1]
+    )
+    Artifact.objects.update(organization_id=run_org)
+    Advice.objects.update(organization_id=run_org)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0013_search_trgm_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='steprun',
+            name='organization_id',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='artifact',
+            name='organization_id',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='advice',
+            name='organization_id',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.RunPython(backfill_organization_id, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='steprun',
+            index=models.Index(fields=['organization_id', '-created_at'], name='steprun_org_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artifact',
+            index=models.Index(fields=['organization_id', '-created_at'], name='artifact_org_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='advice',
+            index=models.Index(fields=['organization_id', '-created_at'], name='advice_org_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-16 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0014_steprun_artifact_advice_organization_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='artifact',
+            name='artifact_type',
+            field=models.CharField(choices=[('h5ad', 'AnnData H5AD'), ('csv', 'CSV Table'), ('parquet', 'Parquet Table'), ('png', 'PNG Image'), ('pdf', 'PDF Report'), ('json', 'JSON Data'), ('html', 'HTML Report')], max_length=20),
+        ),
+    ]
@@ -1,7 +1,11 @@
 import uuid
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+from apps.common.fields import OrjsonField
+from apps.common.ids import uuid7
+
 class Project(models.Model):
     """
     项目：一个生物学问题或实验课题的容器（如"PBMC_2025Q3"）
@@ -54,6 +58,8 @@ class Dataset(models.Model):
     input_barcodes_path = models.CharField(max_length=500, blank=True, null=True)
 
     # Organization & tags/notes
+    # 冗余自 project.organization_id（项目不会更换组织），租户过滤无需 JOIN project
+    organization_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)
     tags = models.JSONField(default=list, blank=True)
     notes = models.TextField(blank=True)
 
@@ -68,6 +74,12 @@ class Dataset(models.Model):
     def __str__(self):
         return f"{self.project.name}/{self.name}"
 
+    def save(self, *args, **kwargs):
+        # 新建或整行保存（可能更换了 project）时同步；仅更新部分字段时跳过
+        if self._state.adding or kwargs.get('update_fields') is None:
+            self.organization_id = self.project.organization_id
+        super().save(*args, **kwargs)
+
 class Step(models.Model):
     """
     静态的步骤定义及默认参数，用于构建分析流水线。
@@ -86,7 +98,7 @@ class Step(models.Model):
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100)
-    step_type = models.CharField(max_length=20, choices=STEP_TYPES)
+    step_type = models.CharField(max_length=20, choices=STEP_TYPES, unique=True)
     description = models.TextField(blank=True)
 
     # Runner contract metadata
@@ -132,6 +144,9 @@ class Session(models.Model):
     # Branching: record parent session if this session was forked from another
     parent_session = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='child_sessions')
 
+    # 冗余自 dataset.organization_id，租户校验为单列比较
+    organization_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = '会话'
@@ -140,6 +155,12 @@ class Session(models.Model):
     def __str__(self):
         return f"{self.dataset}/{self.name} [{self.status}]"
 
+    def save(self, *args, **kwargs):
+        # 新建或整行保存（可能更换了 dataset）时同步；仅更新部分字段时跳过
+        if self._state.adding or kwargs.get('update_fields') is None:
+            self.organization_id = self.dataset.organization_id
+        super().save(*args, **kwargs)
+
 class StepRun(models.Model):
     """
     会话中的单步执行记录，记录参数、指标、产物等，并支持父子关系形成流水线。
@@ -152,13 +173,13 @@ class StepRun(models.Model):
         ('CANCELED', 'Canceled'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)  # 时间有序，插入追加到索引尾部
     session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='step_runs', null=True, blank=True)
     step = models.ForeignKey(Step, on_delete=models.CASCADE)
 
     # Execution metadata
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
-    params_json = models.JSONField(default=dict)
+    params_json = OrjsonField(default=dict)
 
     # Optional ordering within a session
     order_index = models.PositiveIntegerField(default=0)
@@ -169,8 +190,8 @@ class StepRun(models.Model):
     input_files_hash = models.CharField(max_length=64, blank=True)
 
     # Execution results
-    metrics_json = models.JSONField(default=dict, blank=True)
-    evidence_json = models.JSONField(default=dict, blank=True)
+    metrics_json = OrjsonField(default=dict, blank=True)
+    evidence_json = OrjsonField(default=dict, blank=True)
 
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -183,23 +204,39 @@ class StepRun(models.Model):
     # Pinning & comparison
     is_pinned = models.BooleanField(default=False)
 
+    # 冗余自 session.organization_id，租户过滤无需 JOIN 会话表
+    organization_id = models.CharField(max_length=100, blank=True, null=True)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['organization_id', '-created_at'], name='steprun_org_created_idx'),
+            models.Index(fields=['session', '-created_at'], name='steprun_session_created_idx'),
+            models.Index(fields=['status'], name='steprun_status_idx'),
+            models.Index(fields=['session', 'order_index'], name='steprun_session_order_idx'),
+            models.Index(fields=['session', 'status', '-created_at'], name='steprun_sess_status_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.session.name}/{self.step.name} [{self.status}]"
 
+    def save(self, *args, **kwargs):
+        if (self._state.adding or kwargs.get('update_fields') is None) and self.session_id:
+            self.organization_id = self.session.organization_id
+        super().save(*args, **kwargs)
+
 class Artifact(models.Model):
     ARTIFACT_TYPES = [
         ('h5ad', 'AnnData H5AD'),
         ('csv', 'CSV Table'),
+        ('parquet', 'Parquet Table'),
         ('png', 'PNG Image'),
         ('pdf', 'PDF Report'),
         ('json', 'JSON Data'),
         ('html', 'HTML Report'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     step_run = models.ForeignKey(StepRun, on_delete=models.CASCADE, related_name='artifacts')
 
     name = models.CharField(max_length=255)
@@ -211,14 +248,27 @@ class Artifact(models.Model):
     # Metadata
     metadata = models.JSONField(default=dict, blank=True)
 
+    # 冗余自 step_run.organization_id（bulk_create 不经过 save，调用方需显式赋值）
+    organization_id = models.CharField(max_length=100, blank=True, null=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['organization_id', '-created_at'], name='artifact_org_created_idx'),
+            models.Index(fields=['step_run', '-created_at'], name='artifact_run_created_idx'),
+            models.Index(fields=['step_run', 'artifact_type'], name='artifact_run_type_idx'),
+        ]
 
     def __str__(self):
         return f"{self.step_run}/{self.name}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding or kwargs.get('update_fields') is None:
+            self.organization_id = self.step_run.organization_id
+        super().save(*args, **kwargs)
+
 class Advice(models.Model):
     ADVICE_TYPES = [
         ('parameter_optimization', 'Parameter Optimization'),
@@ -245,7 +295,7 @@ class Advice(models.Model):
     evidence_text = models.TextField()
 
     # Actionable patch
-    patch_json = models.JSONField(default=dict, blank=True)  # Parameter/code changes
+    patch_json = OrjsonField(default=dict, blank=True)  # Parameter/code changes
     patch_type = models.CharField(max_length=20, default='params')  # params|code|both
 
     # Application tracking
@@ -256,14 +306,26 @@ class Advice(models.Model):
     # Rollback support
     rollback_data = models.JSONField(default=dict, blank=True)
 
+    # 冗余自 step_run.organization_id（bulk_create 不经过 save，调用方需显式赋值）
+    organization_id = models.CharField(max_length=100, blank=True, null=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['organization_id', '-created_at'], name='advice_org_created_idx'),
+            models.Index(fields=['step_run', '-created_at'], name='advice_run_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.step_run} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding or kwargs.get('update_fields') is None:
+            self.organization_id = self.step_run.organization_id
+        super().save(*args, **kwargs)
+
 class AuditLog(models.Model):
     ACTION_TYPES = [
         ('create', 'Create'),
@@ -274,11 +336,12 @@ class AuditLog(models.Model):
         ('rollback', 'Rollback'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
 
     # Who & When
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # 事件发生时间（缓冲批量写入时保留记录时刻，不用 auto_now_add）
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
     # What
     action_type = models.CharField(max_length=20, choices=ACTION_TYPES)
@@ -286,7 +349,7 @@ class AuditLog(models.Model):
     object_id = models.UUIDField()
 
     # Details
-    changes = models.JSONField(default=dict, blank=True)
+    changes = OrjsonField(default=dict, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
 
     # Context
@@ -295,6 +358,11 @@ class AuditLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['object_type', 'object_id', '-timestamp'], name='auditlog_object_ts_idx'),
+            models.Index(fields=['user', '-timestamp'], name='auditlog_user_ts_idx'),
+            models.Index(fields=['-timestamp'], name='auditlog_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} {self.action_type} {self.object_type} at {self.timestamp}"
\ No newline at end of file
@@ -10,7 +10,8 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class ProjectSerializer(serializers.ModelSerializer):
-    owner = UserSerializer(read_only=True)
+    # 列表仅输出 owner 主键（直接读 owner_id，不触发额外查询）
+    owner = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = Project
@@ -18,6 +19,14 @@ class ProjectSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'owner', 'created_at', 'updated_at', 'organization_id']
 
 
+class ProjectDetailSerializer(ProjectSerializer):
+    # 详情页嵌套 owner 信息，配合视图集 select_related('owner') 使用
+    owner = UserSerializer(read_only=True)
+
+    class Meta(ProjectSerializer.Meta):
+        pass
+
+
 class DatasetSerializer(serializers.ModelSerializer):
     class Meta:
         model = Dataset
@@ -47,6 +56,8 @@ class SessionSerializer(serializers.ModelSerializer):
 
 
 class StepRunSerializer(serializers.ModelSerializer):
+    LIST_EXCLUDED_FIELDS = ('metrics_json', 'evidence_json')
+
     class Meta:
         model = StepRun
         fields = [
@@ -57,6 +68,12 @@ class StepRunSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'status', 'metrics_json', 'evidence_json', 'created_at', 'started_at', 'finished_at']
 
 
+class StepRunListSerializer(StepRunSerializer):
+    """列表视图：不含 metrics_json/evidence_json 大字段（详情/导出接口再取）"""
+    class Meta(StepRunSerializer.Meta):
+        fields = [f for f in StepRunSerializer.Meta.fields if f not in StepRunSerializer.LIST_EXCLUDED_FIELDS]
+
+
 class ArtifactSerializer(serializers.ModelSerializer):
     class Meta:
         model = Artifact
@@ -74,8 +91,22 @@ class AdviceSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class AdviceListSerializer(AdviceSerializer):
+    """列表视图：不含 rollback_data（回滚快照仅 apply/rollback 使用）"""
+    class Meta(AdviceSerializer.Meta):
+        fields = [f for f in AdviceSerializer.Meta.fields if f != 'rollback_data']
+
+
 class AuditLogSerializer(serializers.ModelSerializer):
+    LIST_EXCLUDED_FIELDS = ('changes', 'metadata')
+
     class Meta:
         model = AuditLog
         fields = ['id', 'user', 'timestamp', 'action_type', 'object_type', 'object_id', 'changes', 'metadata', 'ip_address', 'user_agent']
-        read_only_fields = ['id', 'timestamp']
\ No newline at end of file
+        read_only_fields = ['id', 'timestamp']
+
+
+class AuditLogListSerializer(AuditLogSerializer):
+    """列表视图：不含 changes/metadata JSON 字段（?detail=1 或详情接口再取）"""
+    class Meta(AuditLogSerializer.Meta):
+        fields = [f for f in AuditLogSerializer.Meta.fields if f not in AuditLogSerializer.LIST_EXCLUDED_FIELDS]
\ No newline at end of file
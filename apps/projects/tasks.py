@@ -1,8 +1,12 @@
-import time
 import uuid
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 from celery import shared_task
+from celery.signals import worker_process_init
+from django.db import transaction
+from django.db.models import Subquery
 from django.utils import timezone
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
@@ -11,13 +15,29 @@ from .models import StepRun, Step, Artifact, Advice
 from apps.steps.runners.qc_runner import run_qc
 from django.conf import settings
 from apps.advice.analyzer import AdviceEngine
+from .audit import flush_buffer
+from . import h5ad_cache
+from apps.steps import presence
 # 新增导入其他 Runner
 from apps.steps.runners.hvg_runner import run_hvg
 from apps.steps.runners.pca_runner import run_pca
 from apps.steps.runners.umap_runner import run_umap
 from apps.steps.runners.cluster_runner import run_cluster
-import boto3
-from botocore.client import Config
+# 与 Runner 共用同一个进程级客户端（连接池按分片并发放大）
+from apps.steps.runners._s3util import get_s3_client as _get_s3_client
+
+
+def _ws_group(task_id, org_id: str | None = None) -> str:
+    return f"task_{task_id}" if not org_id else f"org_{org_id}_task_{task_id}"
+
+
+async def _group_send_many(channel_layer, messages):
+    """在同一个事件循环中依次发送多条消息
+    顺序 await 而非 gather：同一任务的阶段消息（SAVING → DONE）必须保持先后顺序；
+    RedisChannelLayer 的 group_send 在服务端用一次 Lua 脚本向组内全部成员扇出
+    """
+    for group, payload in messages:
+        await channel_layer.group_send(group, {'type': 'task.message', 'payload': payload})
 
 
 def ws_send(task_id, payload, org_id: str | None = None):
@@ -27,27 +47,40 @@ def ws_send(task_id, payload, org_id: str | None = None):
         payload (dict): 要发送的消息体
         org_id (Optional[str]): 组织ID，用于多租户隔离（可选）
     """
-    channel_layer = get_channel_layer()
-    group = f"task_{task_id}" if not org_id else f"org_{org_id}_task_{task_id}"
-    async_to_sync(channel_layer.group_send)(
-        group,
-        {
-            'type': 'task.message',
-            'payload': payload,
-        }
-    )
+    if not presence.has_subscribers(task_id):
+        return
+    async_to_sync(_group_send_many)(get_channel_layer(), [(_ws_group(task_id, org_id), payload)])
 
 
-def _get_s3_client():
-    """返回已配置的 S3/MinIO 客户端，用于对象存储操作"""
-    return boto3.client(
-        's3',
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        config=Config(signature_version='s3v4'),
-        region_name='us-east-1'
-    )
+class WSBuffer:
+    """缓冲同一阶段内的多条 WebSocket 消息，flush 时只进入一次 async_to_sync
+    订阅者在 flush 时才检查：缓冲期间连上的客户端也能收到终态消息
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    def add(self, task_id, payload, org_id: str | None = None):
+        self.messages.append((task_id, _ws_group(task_id, org_id), payload))
+
+    def flush(self):
+        if not self.messages:
+            return
+        messages, self.messages = self.messages, []
+        live = {task_id for task_id in {m[0] for m in messages} if presence.has_subscribers(task_id)}
+        messages = [(group, payload) for task_id, group, payload in messages if task_id in live]
+        if messages:
+            async_to_sync(_group_send_many)(get_channel_layer(), messages)
+
+
+@worker_process_init.connect
+def _reset_s3_client(**kwargs):
+    """prefork 子进程启动时丢弃父进程创建的客户端（boto3 客户端不可跨 fork 共享）"""
+    _get_s3_client.cache_clear()
+
+
+# 无法按前缀批量列举时并发 HEAD 的线程数上限（I/O 密集，等待网络时释放 GIL）
+HEAD_MAX_WORKERS = 16
 
 
 def _get_s3_file_size(key: str) -> int:
@@ -60,8 +93,37 @@ def _get_s3_file_size(key: str) -> int:
         return 0
 
 
+def _bulk_stat_keys(keys: list[str]) -> dict[str, int]:
+    """一次 ListObjectsV2（按公共前缀分页）批量获取多个 Key 的大小，替代逐个 HEAD
+    无公共前缀时退回 HEAD（线程池并发，boto3 客户端线程安全），避免列举整个桶；失败的 Key 不出现在结果中
+    """
+    wanted = set(keys)
+    if not wanted:
+        return {}
+    if len(wanted) == 1:
+        key = next(iter(wanted))
+        return {key: _get_s3_file_size(key)}
+    unique = list(wanted)
+    prefix = os.path.commonprefix(unique)
+    if not prefix:
+        with ThreadPoolExecutor(max_workers=min(HEAD_MAX_WORKERS, len(unique))) as ex:
+            return dict(zip(unique, ex.map(_get_s3_file_size, unique)))
+    sizes: dict[str, int] = {}
+    try:
+        paginator = _get_s3_client().get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Prefix=prefix):
+            for obj in page.get('Contents', ()):
+                if obj['Key'] in wanted:
+                    sizes[obj['Key']] = int(obj['Size'])
+            if len(sizes) == len(wanted):
+                break
+    except Exception:
+        pass
+    return sizes
+
+
 def _persist_results_and_advice(run: StepRun, result: dict, final_phase_message: str = 'SUCCEEDED') -> dict:
-    """通用持久化逻辑：保存metrics/evidence、登记artifacts并生成AI建议
+    """通用持久化逻辑：保存metrics/evidence、登记artifacts并投递AI建议生成任务
     Args:
         run: 当前StepRun
         result: runner返回的结果字典，包含metrics/evidence/artifacts
@@ -86,49 +148,146 @@ def _persist_results_and_advice(run: StepRun, result: dict, final_phase_message:
             pass
         return {'status': run.status, 'metrics': metrics}
 
-    # 持久化指标与证据
-    run.metrics_json = metrics
-    run.evidence_json = evidence
-    run.save(update_fields=['metrics_json', 'evidence_json'])
-
-    # 保存产物
-    try:
-        ws_send(task_id=str(run.id), payload={'phase': 'SAVING', 'progress': 70, 'message': 'Persisting artifacts'})
-    except Exception:
-        pass
-
-    for art in artifacts:
-        key = art.get('path') or art.get('file_path') or ''
-        if not key:
-            continue
-        size = _get_s3_file_size(key)
-        Artifact.objects.create(
+    # 保存产物（持久化阶段很短，SAVING 与 DONE 合并为一次推送）
+    ws_buffer = WSBuffer()
+    ws_buffer.add(str(run.id), {'phase': 'SAVING', 'progress': 70, 'message': 'Persisting artifacts'})
+
+    keys = [art.get('path') or art.get('file_path') or '' for art in artifacts]
+    # Runner 已上报 size 的产物无需再访问对象存储，仅对缺失的 Key 批量查询
+    sizes = _bulk_stat_keys([
+        key for art, key in zip(artifacts, keys)
+        if key and not (art.get('size') or art.get('file_size'))
+    ])
+    artifact_objs = [
+        Artifact(
             step_run=run,
+            organization_id=run.organization_id,
             name=art.get('name') or os.path.basename(key),
             artifact_type=art.get('type') or 'json',
             file_path=key,
-            file_size=size,
+            file_size=art.get('size') or art.get('file_size') or sizes.get(key, 0),
             metadata={}
         )
+        for art, key in zip(artifacts, keys) if key
+    ]
 
-    # 生成AI建议
-    try:
-        AdviceEngine.generate_advice(run)
-    except Exception:
-        pass
-
-    # 完成
+    # 完成：指标、证据与终态合并为一条 UPDATE；证据为空时不重写 evidence_json
+    run.metrics_json = metrics
     run.status = 'SUCCEEDED'
     run.finished_at = timezone.now()
-    run.save(update_fields=['status', 'finished_at'])
-    try:
-        ws_send(task_id=str(run.id), payload={'phase': 'DONE', 'progress': 100, 'message': final_phase_message})
-    except Exception:
-        pass
+    final_fields = {'metrics_json': metrics, 'status': run.status, 'finished_at': run.finished_at}
+    if evidence:
+        run.evidence_json = final_fields['evidence_json'] = evidence
+    ws_buffer.add(str(run.id), {'phase': 'DONE', 'progress': 100, 'message': final_phase_message})
+
+    def _after_commit():
+        try:
+            ws_buffer.flush()
+        except Exception:
+            pass
+        # AI建议不阻塞主任务：指标落库后交给 advice 队列异步生成
+        try:
+            generate_advice_task.delay(str(run.id))
+        except Exception:
+            pass
+
+    # 产物登记与终态在同一事务内提交；DONE 推送与建议任务仅在提交成功后发出
+    with transaction.atomic():
+        Artifact.objects.bulk_create(artifact_objs, batch_size=500)
+        StepRun.objects.filter(pk=run.pk).update(**final_fields)
+        transaction.on_commit(_after_commit)
 
     return {'status': run.status, 'metrics': metrics}
 
 
+def _normalize_qc_result(result: dict) -> dict:
+    """归一化/补充通用指标以兼容建议引擎（QCAdviceAnalyzer 目前读取 cells 和 high_mito）"""
+    metrics = result.get('metrics', {}) or {}
+    if 'cells' not in metrics:
+        metrics['cells'] = metrics.get('cells_filtered') or metrics.get('cells_raw') or 0
+    if 'high_mito' not in metrics and 'mean_mito_pct' in metrics:
+        try:
+            metrics['high_mito'] = float(metrics['mean_mito_pct']) / 100.0
+        except Exception:
+            metrics['high_mito'] = 0
+    result['metrics'] = metrics
+    return result
+
+
+# step_type -> Runner；'cluster' 为 'clustering' 的别名
+RUNNERS: dict[str, Callable[..., dict]] = {
+    'qc': run_qc,
+    'hvg': run_hvg,
+    'pca': run_pca,
+    'umap': run_umap,
+    'clustering': run_cluster,
+    'cluster': run_cluster,
+}
+# 缺少输入 H5AD 时直接失败的步骤及错误信息（其余步骤交由 Runner 自行处理）
+INPUT_REQUIRED: dict[str, str] = {
+    'qc': 'Dataset.input_h5ad_path is required for QC',
+    'hvg': 'No input H5AD found for HVG',
+}
+# Runner 结果后处理
+RESULT_NORMALIZERS: dict[str, Callable[[dict], dict]] = {
+    'qc': _normalize_qc_result,
+}
+_TRUE_STRINGS = frozenset({'true', '1', 'yes', 'on'})
+_FALSE_STRINGS = frozenset({'false', '0', 'no', 'off'})
+
+
+def _parse_bool(value) -> bool:
+    """布尔参数解析：接受 bool、0/1 及 'true'/'false'/'1'/'0'/'yes'/'no'/'on'/'off'（不区分大小写）
+    Raises:
+        ValueError: 无法识别的取值（bool('false') 为 True，不能直接用 bool 转换）
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE_STRINGS:
+            return True
+        if text in _FALSE_STRINGS:
+            return False
+    raise ValueError(f'Invalid boolean value: {value!r}')
+
+
+# step_type -> {参数名: (类型/解析函数, 默认值)}；run_step 入口一次性补默认值并做类型转换，Runner 直接使用
+PARAM_SCHEMAS: dict[str, dict[str, tuple[Callable[[object], object], object]]] = {
+    'qc': {'min_genes': (int, 200), 'max_genes': (int, 5000), 'min_cells': (int, 3),
+           'max_mito': (float, 0.20), 'max_ribo': (float, 1.0)},
+    'hvg': {'method': (str, 'seurat_v3'), 'n_top_genes': (int, 2000), 'subset_to_hvg': (_parse_bool, True)},
+    'pca': {'n_components': (int, 50), 'svd_solver': (str, 'randomized'), 'embedding_format': (str, 'parquet')},
+    'umap': {'n_neighbors': (int, 15), 'min_dist': (float, 0.1), 'metric': (str, 'euclidean')},
+    'clustering': {'resolution': (float, 1.0), 'method': (str, 'leiden')},
+}
+PARAM_SCHEMAS['cluster'] = PARAM_SCHEMAS['clustering']
+# 参数别名 -> 规范名（步骤默认参数与建议补丁使用 n_pcs，PCA Runner 读取 n_components）
+PARAM_ALIASES: dict[str, dict[str, str]] = {
+    'pca': {'n_pcs': 'n_components'},
+}
+
+
+def _normalize_params(step_type: str, params: dict) -> dict:
+    """按 PARAM_SCHEMAS 归一化参数：解析别名、补默认值、类型转换；未声明的参数原样保留
+    Raises:
+        ValueError/TypeError: 参数值无法转换为声明类型
+    """
+    schema = PARAM_SCHEMAS.get(step_type)
+    if schema is None:
+        return params
+    out = dict(params)
+    for alias, name in PARAM_ALIASES.get(step_type, {}).items():
+        if alias in out:
+            out.setdefault(name, out.pop(alias))
+    for name, (cast, default) in schema.items():
+        value = out.get(name)
+        out[name] = default if value is None else cast(value)
+    return out
+
+
 def _select_input_h5ad(run: StepRun) -> str | None:
     """选择下游步骤的数据输入优先级：
     1) 同一Session内最近一次成功运行的H5AD产物；
@@ -136,18 +295,21 @@ def _select_input_h5ad(run: StepRun) -> str | None:
     返回S3/MinIO Key（不带s3://前缀）或None。
     """
     dataset = run.session.dataset if run.session else None
-    # 优先找同Session最近成功的H5AD产物
-    if run.session:
+    # 优先找同Session最近成功运行的H5AD产物（子查询，一次往返）
+    if run.session_id:
         prev_run = (
-            StepRun.objects.filter(session=run.session, status='SUCCEEDED')
+            StepRun.objects.filter(session_id=run.session_id, status='SUCCEEDED')
             .exclude(id=run.id)
             .order_by('-created_at')
+            .values('id')[:1]
+        )
+        h5ad_path = (
+            Artifact.objects.filter(step_run=Subquery(prev_run), artifact_type='h5ad')
+            .values_list('file_path', flat=True)
             .first()
         )
-        if prev_run:
-            h5ad_art = prev_run.artifacts.filter(artifact_type='h5ad').first()
-            if h5ad_art and h5ad_art.file_path:
-                return h5ad_art.file_path
+        if h5ad_path:
+            return h5ad_path
     # 退回到数据集的初始路径
     if dataset and getattr(dataset, 'input_h5ad_path', None):
         return dataset.input_h5ad_path
@@ -155,113 +317,72 @@ def _select_input_h5ad(run: StepRun) -> str | None:
 
 
 @shared_task(bind=True, name='projects.run_step')
-def run_step(self, step_run_id: str):
+def run_step(self, step_run_id: str, session_id: str | None = None, step_id: str | None = None, params: dict | None = None):
     """执行单步分析任务（Celery 任务）
     Args:
         step_run_id (str): StepRun 主键ID
+        session_id (Optional[str]): 会话ID；与 step_id 同时提供时由 worker 创建 StepRun（请求线程不再写库）
+        step_id (Optional[str]): 步骤ID
+        params (Optional[dict]): 步骤参数
     Returns:
         dict: 任务结果，包含状态与关键指标
     """
-    # 修复：去除无效的 select_related('sample')，改为有效字段，并预取 dataset
-    run = StepRun.objects.select_related('session', 'step', 'session__dataset').get(id=step_run_id)
-    run.status = 'RUNNING'
-    run.started_at = timezone.now()
-    run.save(update_fields=['status', 'started_at'])
+    # 置为 RUNNING 直接写库（新建时随 INSERT 一并写入），无需先读出再 save
+    started_at = timezone.now()
+    created = False
+    if session_id and step_id:
+        _, created = StepRun.objects.get_or_create(
+            id=step_run_id,
+            defaults={'session_id': session_id, 'step_id': step_id, 'params_json': params or {},
+                      'status': 'RUNNING', 'started_at': started_at},
+        )
+    if not created:
+        StepRun.objects.filter(id=step_run_id).update(status='RUNNING', started_at=started_at)
 
     # 推送开始阶段
     try:
-        ws_send(task_id=str(run.id), payload={'phase': 'START', 'progress': 5, 'message': 'RUNNING'})
+        ws_send(task_id=str(step_run_id), payload={'phase': 'START', 'progress': 5, 'message': 'RUNNING'})
     except Exception:
         pass
 
-    if settings.DEBUG:
-        time.sleep(1)
+    run = StepRun.objects.select_related('session', 'step', 'session__dataset').get(id=step_run_id)
 
     step_type = run.step.step_type
     params = run.params_json or {}
 
-    # QC：真实执行
-    if step_type == 'qc':
-        dataset = run.session.dataset if run.session else None
-        data_uri = getattr(dataset, 'input_h5ad_path', None) if dataset else None
-        if not data_uri:
-            # 没有提供 H5AD 输入，直接失败
-            run.metrics_json = {'error': 'Dataset.input_h5ad_path is required for QC'}
-            run.status = 'FAILED'
-            run.finished_at = timezone.now()
-            run.save(update_fields=['metrics_json', 'status', 'finished_at'])
-            try:
-                ws_send(task_id=str(run.id), payload={'phase': 'FAILED', 'progress': 100, 'message': 'Missing H5AD'})
-            except Exception:
-                pass
-            return {'status': run.status, 'metrics': run.metrics_json}
-
-        inputs = {
-            'data_uri': data_uri,  # S3/MinIO Key 或 s3://bucket/key
-            'step_run_id': str(run.id),
-        }
-
-        # 调用真实 QC Runner
+    runner = RUNNERS.get(step_type)
+    if runner is not None:
         try:
-            result = run_qc(inputs=inputs, params=params)
-        except Exception as e:
-            result = {'artifacts': [], 'metrics': {'error': str(e)}, 'evidence': {}}
+            params = _normalize_params(step_type, params)
+        except (TypeError, ValueError) as e:
+            result = {'artifacts': [], 'metrics': {'error': f'Invalid parameters: {e}'}, 'evidence': {}}
+            return _persist_results_and_advice(run, result)
+        # QC 读取数据集原始输入；下游步骤优先使用上游 H5AD 产物（若无则回退到数据集）
+        if step_type == 'qc':
+            dataset = run.session.dataset if run.session else None
+            data_uri = getattr(dataset, 'input_h5ad_path', None) if dataset else None
+        else:
+            data_uri = _select_input_h5ad(run)
+        if not data_uri and step_type in INPUT_REQUIRED:
+            result = {'artifacts': [], 'metrics': {'error': INPUT_REQUIRED[step_type]}, 'evidence': {}}
+            return _persist_results_and_advice(run, result)
 
-        # 归一化/补充通用指标以兼容建议引擎（QCAdviceAnalyzer 目前读取 cells 和 high_mito）
-        metrics = result.get('metrics', {}) or {}
-        if 'cells' not in metrics:
-            metrics['cells'] = metrics.get('cells_filtered') or metrics.get('cells_raw') or 0
-        if 'high_mito' not in metrics and 'mean_mito_pct' in metrics:
+        inputs = {'step_run_id': str(run.id)}
+        if data_uri:
+            inputs['data_uri'] = data_uri  # S3/MinIO Key 或 s3://bucket/key
             try:
-                metrics['high_mito'] = float(metrics['mean_mito_pct']) / 100.0
+                # 本地缓存副本（命中时免下载）；不可用时由 Runner 自行下载
+                inputs['local_path'] = h5ad_cache.get_local_path(_get_s3_client(), data_uri)
             except Exception:
-                metrics['high_mito'] = 0
-        result['metrics'] = metrics
-
-        return _persist_results_and_advice(run, result, final_phase_message='QC SUCCEEDED')
-
-    # HVG：基于上游H5AD输入（若无则回退到数据集）
-    if step_type == 'hvg':
-        data_uri = _select_input_h5ad(run)
-        if not data_uri:
-            result = {'artifacts': [], 'metrics': {'error': 'No input H5AD found for HVG'}, 'evidence': {}}
-            return _persist_results_and_advice(run, result)
-        inputs = {'data_uri': data_uri, 'step_run_id': str(run.id)}
-        try:
-            result = run_hvg(inputs=inputs, params=params)
-        except Exception as e:
-            result = {'artifacts': [], 'metrics': {'error': str(e)}, 'evidence': {}}
-        return _persist_results_and_advice(run, result, final_phase_message='HVG SUCCEEDED')
-
-    # PCA：依赖上游（通常是HVG/归一化）的输出
-    if step_type == 'pca':
-        data_uri = _select_input_h5ad(run)
-        inputs = {'data_uri': data_uri, 'step_run_id': str(run.id)} if data_uri else {'step_run_id': str(run.id)}
-        try:
-            result = run_pca(inputs=inputs, params=params)
-        except Exception as e:
-            result = {'artifacts': [], 'metrics': {'error': str(e)}, 'evidence': {}}
-        return _persist_results_and_advice(run, result, final_phase_message='PCA SUCCEEDED')
-
-    # UMAP：依赖上游（通常是PCA）的输出
-    if step_type == 'umap':
-        data_uri = _select_input_h5ad(run)
-        inputs = {'data_uri': data_uri, 'step_run_id': str(run.id)} if data_uri else {'step_run_id': str(run.id)}
-        try:
-            result = run_umap(inputs=inputs, params=params)
-        except Exception as e:
-            result = {'artifacts': [], 'metrics': {'error': str(e)}, 'evidence': {}}
-        return _persist_results_and_advice(run, result, final_phase_message='UMAP SUCCEEDED')
-
-    # Clustering：依赖上游（通常是邻接图/PCA）的输出
-    if step_type == 'clustering':
-        data_uri = _select_input_h5ad(run)
-        inputs = {'data_uri': data_uri, 'step_run_id': str(run.id)} if data_uri else {'step_run_id': str(run.id)}
+                pass
         try:
-            result = run_cluster(inputs=inputs, params=params)
+            result = runner(inputs=inputs, params=params)
         except Exception as e:
             result = {'artifacts': [], 'metrics': {'error': str(e)}, 'evidence': {}}
-        return _persist_results_and_advice(run, result, final_phase_message='CLUSTERING SUCCEEDED')
+        normalize = RESULT_NORMALIZERS.get(step_type)
+        if normalize is not None:
+            result = normalize(result)
+        return _persist_results_and_advice(run, result, final_phase_message=f'{step_type.upper()} SUCCEEDED')
 
     # -------------------- 其它未知步骤暂用演示逻辑 --------------------
     metrics = {
@@ -289,4 +410,21 @@ def run_step(self, step_run_id: str):
         ws_send(task_id=str(run.id), payload={'phase': 'DONE', 'progress': 100, 'message': 'SUCCEEDED'})
     except Exception:
         pass
-    return {'status': run.status, 'metrics': metrics}
\ No newline at end of file
+    return {'status': run.status, 'metrics': metrics}
+
+
+@shared_task(name='projects.generate_advice', ignore_result=True)
+def generate_advice_task(step_run_id: str):
+    """为已完成的StepRun生成AI建议（路由到 advice 队列），完成后推送 ADVICE 阶段"""
+    count = AdviceEngine.generate_advice_by_id(step_run_id)
+    try:
+        ws_send(task_id=str(step_run_id), payload={'phase': 'ADVICE', 'progress': 100, 'message': f'{count or 0} advice generated'})
+    except Exception:
+        pass
+    return count
+
+
+@shared_task(name='projects.flush_audit_logs', ignore_result=True)
+def flush_audit_logs():
+    """周期任务：将 Redis 中缓冲的审计日志批量落库"""
+    return flush_buffer()
@@ -4,34 +4,42 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Prefetch, Q
 
 from .models import Project, Dataset, Session, Step, StepRun, Artifact, Advice, AuditLog
+from .apps import DEFAULT_STEPS
+from .audit import record_audit
+from .filters import parse_list_filters
 from .serializers import (
-    ProjectSerializer, DatasetSerializer, SessionSerializer, StepSerializer, StepRunSerializer,
-    ArtifactSerializer, AdviceSerializer, AuditLogSerializer
+    ProjectSerializer, ProjectDetailSerializer, DatasetSerializer, SessionSerializer, StepSerializer, StepRunSerializer,
+    StepRunListSerializer, ArtifactSerializer, AdviceSerializer, AdviceListSerializer, AuditLogSerializer,
+    AuditLogListSerializer,
 )
+from apps.common.middleware import get_request_organization_id
+from apps.common.mixins import CachedListMixin, OrgScopedQuerysetMixin, invalidate_list_cache
 from apps.common.permissions import IsOrgMember, RBACByRole, SessionRBAC, ProjectRBAC
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(CachedListMixin, OrgScopedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated, IsOrgMember, ProjectRBAC]
 
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return ProjectDetailSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
         qs = super().get_queryset()
-        profile = getattr(self.request.user, 'profile', None)
-        if profile and profile.organization:
-            return qs.filter(organization_id=str(profile.organization.id))
+        if self.action == 'retrieve':
+            qs = qs.select_related('owner')
         return qs
 
     def perform_create(self, serializer):
-        owner = self.request.user
-        profile = getattr(owner, 'profile', None)
-        org_id = str(profile.organization.id) if profile and profile.organization else None
-        serializer.save(owner=owner, organization_id=org_id)
+        serializer.save(owner=self.request.user, organization_id=get_request_organization_id(self.request))
 
-class DatasetViewSet(viewsets.ModelViewSet):
+class DatasetViewSet(CachedListMixin, OrgScopedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Dataset.objects.all()
     serializer_class = DatasetSerializer
     permission_classes = [IsAuthenticated, IsOrgMember, RBACByRole]
@@ -45,32 +53,24 @@ class DatasetViewSet(viewsets.ModelViewSet):
         - project: filter by project id (exact)
         """
         qs = super().get_queryset()
-        profile = getattr(self.request.user, 'profile', None)
-        if profile and profile.organization:
-            qs = qs.filter(project__organization_id=str(profile.organization.id))
         # Filters: q (name or notes), tags (comma-separated), created_before/after
-        q = self.request.query_params.get('q')
-        if q:
-            qs = qs.filter(Q(name__icontains=q) | Q(notes__icontains=q))
-        tags = self.request.query_params.get('tags')
-        if tags:
-            tag_list = [t.strip() for t in tags.split(',') if t.strip()]
-            for t in tag_list:
-                qs = qs.filter(tags__contains=[t])
-        created_after = self.request.query_params.get('created_after')
-        created_before = self.request.query_params.get('created_before')
-        if created_after:
-            qs = qs.filter(created_at__gte=created_after)
-        if created_before:
-            qs = qs.filter(created_at__lte=created_before)
+        f = parse_list_filters(self.request.query_params)
+        if f.q:
+            qs = qs.filter(Q(name__icontains=f.q) | Q(notes__icontains=f.q))
+        if f.tags:
+            # 单个 @> 谓词即可要求包含全部标签，可命中 tags GIN 索引
+            qs = qs.filter(tags__contains=list(f.tags))
+        if f.created_after:
+            qs = qs.filter(created_at__gte=f.created_after)
+        if f.created_before:
+            qs = qs.filter(created_at__lte=f.created_before)
         # New: filter by project id if provided
-        project_id = self.request.query_params.get('project')
-        if project_id:
-            qs = qs.filter(project_id=project_id)
+        if f.project:
+            qs = qs.filter(project_id=f.project)
         return qs
 
-class SessionViewSet(viewsets.ModelViewSet):
-    queryset = Session.objects.select_related('dataset', 'current_step').all()
+class SessionViewSet(CachedListMixin, OrgScopedQuerysetMixin, viewsets.ModelViewSet):
+    queryset = Session.objects.all()
     serializer_class = SessionSerializer
     permission_classes = [IsAuthenticated, IsOrgMember, SessionRBAC]
 
@@ -85,35 +85,34 @@ class SessionViewSet(viewsets.ModelViewSet):
         - project: filter by project id (exact, filtering through dataset)
         """
         qs = super().get_queryset()
-        profile = getattr(self.request.user, 'profile', None)
-        if profile and profile.organization:
-            qs = qs.filter(dataset__project__organization_id=str(profile.organization.id))
+        # 序列化器只输出 dataset/current_step 主键，列表无需 JOIN；
+        # 整行保存（Session.save 同步 organization_id）与 fork 需要读取 dataset
+        if self.action in ('update', 'partial_update', 'fork'):
+            qs = qs.select_related('dataset')
+        elif self.action == 'latest_state':
+            # 切片 Prefetch（窗口函数）每个会话只取最新一步，随会话一并加载
+            qs = qs.prefetch_related(Prefetch(
+                'step_runs', queryset=StepRun.objects.order_by('-created_at')[:1], to_attr='latest_runs'
+            ))
         # Filters: q (name/description), tags, status, created_before/after
-        q = self.request.query_params.get('q')
-        if q:
-            qs = qs.filter(Q(name__icontains=q) | Q(description__icontains=q))
-        status_q = self.request.query_params.get('status')
-        if status_q:
-            qs = qs.filter(status=status_q)
-        tags = self.request.query_params.get('tags')
-        if tags:
-            tag_list = [t.strip() for t in tags.split(',') if t.strip()]
-            for t in tag_list:
-                qs = qs.filter(tags__contains=[t])
-        created_after = self.request.query_params.get('created_after')
-        created_before = self.request.query_params.get('created_before')
-        if created_after:
-            qs = qs.filter(created_at__gte=created_after)
-        if created_before:
-            qs = qs.filter(created_at__lte=created_before)
+        f = parse_list_filters(self.request.query_params)
+        if f.q:
+            qs = qs.filter(Q(name__icontains=f.q) | Q(description__icontains=f.q))
+        if f.status:
+            qs = qs.filter(status=f.status)
+        if f.tags:
+            # 单个 @> 谓词即可要求包含全部标签，可命中 tags GIN 索引
+            qs = qs.filter(tags__contains=list(f.tags))
+        if f.created_after:
+            qs = qs.filter(created_at__gte=f.created_after)
+        if f.created_before:
+            qs = qs.filter(created_at__lte=f.created_before)
         # Filter by dataset id if provided
-        dataset_id = self.request.query_params.get('dataset')
-        if dataset_id:
-            qs = qs.filter(dataset_id=dataset_id)
+        if f.dataset:
+            qs = qs.filter(dataset_id=f.dataset)
         # New: filter by project id if provided (through dataset)
-        project_id = self.request.query_params.get('project')
-        if project_id:
-            qs = qs.filter(dataset__project_id=project_id)
+        if f.project:
+            qs = qs.filter(dataset__project_id=f.project)
         return qs
 
     @action(detail=True, methods=['post'])
@@ -135,7 +134,7 @@ class SessionViewSet(viewsets.ModelViewSet):
     def latest_state(self, request, pk=None):
         """获取会话最新一步的状态与参数，用于“继续分析”恢复现场"""
         session = self.get_object()
-        last_run = session.step_runs.order_by('-created_at').first()
+        last_run = next(iter(session.latest_runs), None)
         if not last_run:
             return Response({'detail': 'no runs yet', 'session': SessionSerializer(session).data})
         data = {
@@ -166,43 +165,54 @@ class StepViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def ensure_defaults(self, request):
-        created = []
-        defaults = [
-            {'name': 'Quality Control', 'step_type': 'qc', 'description': 'Basic QC filters', 'runner_image': 'bioai/runner:latest', 'runner_command': 'python qc.py', 'default_params': {'min_genes': 200, 'max_genes': 5000, 'max_mito': 0.1}},
-            {'name': 'Highly Variable Genes', 'step_type': 'hvg', 'description': 'Select HVGs', 'runner_image': 'bioai/runner:latest', 'runner_command': 'python hvg.py', 'default_params': {'method': 'seurat_v3', 'n_top_genes': 2000}},
-            {'name': 'PCA', 'step_type': 'pca', 'description': 'Dimensionality reduction', 'runner_image': 'bioai/runner:latest', 'runner_command': 'python pca.py', 'default_params': {'n_pcs': 30}},
-            {'name': 'UMAP', 'step_type': 'umap', 'description': 'Embedding', 'runner_image': 'bioai/runner:latest', 'runner_command': 'python umap.py', 'default_params': {'min_dist': 0.5}},
-            {'name': 'Clustering', 'step_type': 'clustering', 'description': 'Leiden clustering', 'runner_image': 'bioai/runner:latest', 'runner_command': 'python cluster.py', 'default_params': {'resolution': 0.8}},
-        ]
-        for d in defaults:
-            obj, was_created = Step.objects.get_or_create(step_type=d['step_type'], defaults=d)
-            if was_created:
-                created.append(str(obj.id))
-        return Response({'created': created, 'total': Step.objects.count()})
-
-class StepRunViewSet(viewsets.ModelViewSet):
-    queryset = StepRun.objects.all().select_related('session', 'step')
+        # 与 post_migrate 种子共用 DEFAULT_STEPS，两条路径写入的默认步骤一致。
+        # step_type 唯一：一次查询已有类型 + 一次 bulk_create（冲突行由数据库忽略），替代逐个 get_or_create；
+        # 并发请求可能抢先插入同类型，被忽略的行不计入 created，故按主键回读实际插入的行
+        with transaction.atomic():
+            existing = set(Step.objects.values_list('step_type', flat=True))
+            new_steps = [Step(**d) for d in DEFAULT_STEPS if d['step_type'] not in existing]
+            Step.objects.bulk_create(new_steps, ignore_conflicts=True)
+            created = list(
+                Step.objects.filter(
+                    step_type__in=[s.step_type for s in new_steps], id__in=[s.id for s in new_steps]
+                ).values_list('id', flat=True)
+            ) if new_steps else []
+        # 步骤表每种类型仅一行：被忽略的行已由并发请求插入，每种类型只计一次，无需再 COUNT(*)
+        total = len(existing | {s.step_type for s in new_steps})
+        return Response({'created': [str(pk) for pk in created], 'total': total})
+
+class StepRunViewSet(OrgScopedQuerysetMixin, viewsets.ModelViewSet):
+    queryset = StepRun.objects.all()
     serializer_class = StepRunSerializer
     permission_classes = [IsAuthenticated, IsOrgMember, RBACByRole]
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return StepRunListSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
         qs = super().get_queryset()
-        profile = getattr(self.request.user, 'profile', None)
-        if profile and profile.organization:
-            qs = qs.filter(session__dataset__project__organization_id=str(profile.organization.id))
+        if self.action == 'list':
+            qs = qs.defer(*StepRunSerializer.LIST_EXCLUDED_FIELDS)
         # Filters: step_type, status, pinned, since
-        step_type = self.request.query_params.get('step_type')
-        if step_type:
-            qs = qs.filter(step__step_type=step_type)
-        status_q = self.request.query_params.get('status')
-        if status_q:
-            qs = qs.filter(status=status_q)
-        pinned = self.request.query_params.get('pinned')
-        if pinned in ('true', '1', 'yes'):
+        f = parse_list_filters(self.request.query_params)
+        if f.step_type:
+            qs = qs.filter(step__step_type=f.step_type)
+        if f.status:
+            qs = qs.filter(status=f.status)
+        if f.pinned:
             qs = qs.filter(is_pinned=True)
-        since = self.request.query_params.get('since')
-        if since:
-            qs = qs.filter(created_at__gte=since)
+        if f.since:
+            qs = qs.filter(created_at__gte=f.since)
+        # 序列化器只输出 session/step 主键（取自外键列），列表无需 JOIN；
+        # 按动作预取反向关联/外键，避免逐对象补查
+        if self.action == 'advice':
+            qs = qs.prefetch_related('advice')
+        elif self.action == 'export':
+            qs = qs.prefetch_related('artifacts')
+        elif self.action == 'fork_session':
+            qs = qs.select_related('session__dataset', 'step')
         return qs
 
     @action(detail=True, methods=['post'])
@@ -222,8 +232,8 @@ class StepRunViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def advice(self, request, pk=None):
         run = self.get_object()
-        qs = Advice.objects.filter(step_run=run).order_by('-created_at')
-        return Response(AdviceSerializer(qs, many=True).data)
+        # Advice 默认按 -created_at 排序，直接使用预取结果
+        return Response(AdviceSerializer(run.advice.all(), many=True).data)
 
     @action(detail=True, methods=['post'])
     def fork_session(self, request, pk=None):
@@ -249,19 +259,21 @@ class StepRunViewSet(viewsets.ModelViewSet):
             order_index=0,
             parent_run=None,
         )
+        # 新会话出现在 SessionViewSet 的缓存列表中
+        invalidate_list_cache(request.user)
         return Response(SessionSerializer(new_session).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['get'])
     def export(self, request, pk=None):
         """快速回看与导出：聚合该步参数/指标/产物，返回 JSON 供前端渲染或导出报告"""
         run = self.get_object()
-        artifacts = Artifact.objects.filter(step_run=run).order_by('-created_at')
+        artifacts = run.artifacts.all()
         payload = {
             'run': StepRunSerializer(run).data,
             'artifacts': ArtifactSerializer(artifacts, many=True).data,
         }
         # 审计
-        AuditLog.objects.create(
+        record_audit(
             user=request.user if request.user.is_authenticated else None,
             action_type='export',
             object_type='StepRun',
@@ -271,28 +283,28 @@ class StepRunViewSet(viewsets.ModelViewSet):
         )
         return Response(payload)
 
-class ArtifactViewSet(viewsets.ModelViewSet):
+class ArtifactViewSet(OrgScopedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Artifact.objects.all()
     serializer_class = ArtifactSerializer
     permission_classes = [IsAuthenticated, IsOrgMember, RBACByRole]
 
-    def get_queryset(self):
-        qs = super().get_queryset()
-        profile = getattr(self.request.user, 'profile', None)
-        if profile and profile.organization:
-            return qs.filter(step_run__session__dataset__project__organization_id=str(profile.organization.id))
-        return qs
-
-class AdviceViewSet(viewsets.ModelViewSet):
+class AdviceViewSet(OrgScopedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Advice.objects.all()
     serializer_class = AdviceSerializer
     permission_classes = [IsAuthenticated, IsOrgMember, RBACByRole]
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return AdviceListSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
         qs = super().get_queryset()
-        profile = getattr(self.request.user, 'profile', None)
-        if profile and profile.organization:
-            return qs.filter(step_run__session__dataset__project__organization_id=str(profile.organization.id))
+        if self.action == 'list':
+            qs = qs.defer('rollback_data')
+        # apply/rollback 需要读写所属 StepRun，随建议一并取出
+        if self.action in ('apply', 'rollback'):
+            qs = qs.select_related('step_run')
         return qs
 
     @action(detail=True, methods=['post'])
@@ -301,20 +313,20 @@ class AdviceViewSet(viewsets.ModelViewSet):
         run = advice.step_run
         # 仅处理参数补丁
         if advice.patch_type in ('params', 'both'):
-            original_params = dict(run.params_json or {})
-            new_params = dict(original_params)
+            # 合并时生成新字典，原参数对象不被修改，可直接作为回滚快照
+            original_params = run.params_json or {}
             patch = advice.patch_json or {}
-            new_params.update(patch)
-            run.params_json = new_params
-            run.save(update_fields=['params_json'])
+            run.params_json = {**original_params, **patch}
             # 更新建议状态
             advice.is_applied = True
             advice.applied_at = timezone.now()
             advice.applied_by = request.user if request.user.is_authenticated else None
             advice.rollback_data = {'prev_params': original_params}
-            advice.save(update_fields=['is_applied','applied_at','applied_by','rollback_data'])
+            with transaction.atomic():
+                run.save(update_fields=['params_json'])
+                advice.save(update_fields=['is_applied', 'applied_at', 'applied_by', 'rollback_data'])
             # 审计
-            AuditLog.objects.create(
+            record_audit(
                 user=advice.applied_by,
                 action_type='update',
                 object_type='StepRun',
@@ -337,7 +349,7 @@ class AdviceViewSet(viewsets.ModelViewSet):
         run.save(update_fields=['params_json'])
         advice.is_applied = False
         advice.save(update_fields=['is_applied'])
-        AuditLog.objects.create(
+        record_audit(
             user=request.user if request.user.is_authenticated else None,
             action_type='rollback',
             object_type='StepRun',
@@ -350,4 +362,18 @@ class AdviceViewSet(viewsets.ModelViewSet):
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
-    permission_classes = [IsAuthenticated]
\ No newline at end of file
+    permission_classes = [IsAuthenticated]
+
+    def _list_without_json(self):
+        return self.action == 'list' and self.request.query_params.get('detail') not in ('1', 'true', 'yes')
+
+    def get_serializer_class(self):
+        if self._list_without_json():
+            return AuditLogListSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self._list_without_json():
+            qs = qs.defer(*AuditLogSerializer.LIST_EXCLUDED_FIELDS)
+        return qs
\ No newline at end of file
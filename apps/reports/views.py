@@ -1,11 +1,27 @@
+import functools
 import json
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from django.template.loader import render_to_string
+from django.template.loader import get_template
 from django.utils import timezone
 
-from apps.projects.models import StepRun, Advice, AuditLog
+from apps.projects.models import StepRun, Advice
+from apps.projects.audit import record_audit
+
+# 报告模板读取的 StepRun 列（含 select_related 的外键本身）
+REPORT_RUN_FIELDS = (
+    'id', 'status', 'params_json', 'metrics_json', 'evidence_json', 'started_at', 'finished_at',
+    'step', 'step__name', 'step__step_type',
+    'session', 'session__dataset', 'session__dataset__name',
+    'session__dataset__project', 'session__dataset__project__name',
+)
+
+# 报告模板静态不变：解析后的模板对象进程内复用，免去每次请求的加载器查找
+@functools.lru_cache(maxsize=1)
+def _report_template():
+    return get_template('report_basic.html')
+
 
 @csrf_exempt
 @require_http_methods(["POST"]) 
@@ -19,22 +35,28 @@ def generate_report(request):
     fmt = (data.get('format') or 'html').lower()
 
     try:
-        run = StepRun.objects.select_related('sample','step').get(id=run_id)
+        # 一次 JOIN 取齐模板用到的步骤/数据集/项目信息，只读取需要的列
+        run = (
+            StepRun.objects.select_related('step', 'session__dataset__project')
+            .only(*REPORT_RUN_FIELDS)
+            .get(id=run_id)
+        )
     except StepRun.DoesNotExist:
         return JsonResponse({'detail': 'StepRun not found'}, status=404)
 
-    advice = list(Advice.objects.filter(step_run=run).values())
+    # 只取模板用到的列（不读 patch_json/rollback_data 等 JSON 大字段）
+    advice = list(Advice.objects.filter(step_run=run).values('id', 'title', 'is_applied'))
     context = {
         'run': run,
         'advice': advice,
         'generated_at': timezone.now(),
     }
-    html = render_to_string('report_basic.html', context)
+    html = _report_template().render(context)
 
     # 审计：记录报告导出行为
     try:
         user = getattr(request, 'user', None)
-        AuditLog.objects.create(
+        record_audit(
             user=user if (user and getattr(user, 'is_authenticated', False)) else None,
             action_type='report_export',
             object_type='StepRun',
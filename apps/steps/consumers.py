@@ -1,50 +1,91 @@
+import asyncio
 import json
 import uuid
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from asyncio import sleep
 from datetime import datetime
 
+from . import presence
+
+_DEMO_PHASES = ('QC', 'HVG', 'PCA', 'UMAP', 'CLUSTER')
+
+# StepRun 状态 -> 连接时补发的阶段消息（订阅晚于任务推送时不会错过当前进度）
+_STATUS_SNAPSHOT = {
+    'RUNNING': {'phase': 'START', 'progress': 5, 'message': 'RUNNING'},
+    'SUCCEEDED': {'phase': 'DONE', 'progress': 100, 'message': 'SUCCEEDED'},
+    'FAILED': {'phase': 'FAILED', 'progress': 100, 'message': 'FAILED'},
+}
+
+
+@database_sync_to_async
+def _load_run_status(task_id):
+    from apps.projects.models import StepRun
+    try:
+        return StepRun.objects.filter(pk=task_id).values_list('status', flat=True).first()
+    except Exception:
+        return None
+
+
 class TaskConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
-        await self.accept()
+        # 先于任何 await 赋值：握手期间断开时 disconnect 也能读到
         task_id = self.scope['url_route']['kwargs'].get('id', 'demo')
+        self.task_id = task_id
         self.group_name = f"task_{task_id}"
-        
+        self._subscribed = False
+        await self.accept()
+
         # Join group
         await self.channel_layer.group_add(
             self.group_name,
             self.channel_name
         )
+        await presence.subscribe(task_id)
+        self._subscribed = True
+
+        if task_id != 'demo':
+            snapshot = _STATUS_SNAPSHOT.get(await _load_run_status(task_id))
+            if snapshot:
+                await self.send_json(snapshot)
         
-        # Only simulate for demo tasks
-        if task_id == 'demo':
-            # 模拟推送若干阶段事件
-            for i in range(5):
-                await sleep(0.8)
-                await self.send_json({
-                    'ts': datetime.utcnow().isoformat() + 'Z',
-                    'phase': ['QC','HVG','PCA','UMAP','CLUSTER'][i],
-                    'progress': int((i+1)/5*100),
-                    'message': '阶段运行中',
-                    'metrics': {
-                        'cells': 10000 - i*123,
-                        'doublet_rate': round(0.05 + i*0.005, 3),
-                        'high_mito': round(0.12 - i*0.01, 3)
-                    } if i%2==0 else None
-                })
+        # Only simulate for demo tasks: run in the background so connect returns at once
+        self._demo_task = asyncio.create_task(self._run_demo()) if task_id == 'demo' else None
+
+    async def _run_demo(self):
+        # 模拟推送若干阶段事件
+        for i, phase in enumerate(_DEMO_PHASES):
+            await sleep(0.8)
             await self.send_json({
                 'ts': datetime.utcnow().isoformat() + 'Z',
-                'phase': 'DONE',
-                'progress': 100,
-                'message': 'SUCCEEDED'
+                'phase': phase,
+                'progress': int((i+1)/len(_DEMO_PHASES)*100),
+                'message': '阶段运行中',
+                'metrics': {
+                    'cells': 10000 - i*123,
+                    'doublet_rate': round(0.05 + i*0.005, 3),
+                    'high_mito': round(0.12 - i*0.01, 3)
+                } if i%2==0 else None
             })
-            await self.close()
+        await self.send_json({
+            'ts': datetime.utcnow().isoformat() + 'Z',
+            'phase': 'DONE',
+            'progress': 100,
+            'message': 'SUCCEEDED'
+        })
+        await self.close()
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.group_name,
-            self.channel_name
-        )
+        if getattr(self, '_demo_task', None) is not None:
+            self._demo_task.cancel()
+        if getattr(self, 'group_name', None):
+            await self.channel_layer.group_discard(
+                self.group_name,
+                self.channel_name
+            )
+        # 仅撤销已计入的订阅，避免订阅计数被减到未订阅的连接上
+        if getattr(self, '_subscribed', False):
+            await presence.unsubscribe(self.task_id)
 
     async def task_message(self, event):
         """Handle task.message from group_send"""
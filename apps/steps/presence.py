@@ -0,0 +1,76 @@
+"""
+任务 WebSocket 订阅计数
+
+TaskConsumer 连接/断开时在 Redis 中增减 task_sub:<task_id> 计数（同一任务可能有多个标签页订阅）；
+Celery 侧推送前先查询，无人订阅的任务直接跳过 Channels 层，省去每次 async_to_sync 的事件循环开销。
+只缓存“有订阅者”的结果（进程内 2 秒）：浏览器可能在 START 之后才连上，
+缓存“无人订阅”会吞掉紧随其后的 DONE/FAILED；多发一条给空分组则无害。
+Redis 不可用时一律视为有订阅者（宁可多发，不可漏发）。
+"""
+import time
+
+import redis
+import redis.asyncio as aredis
+from django.conf import settings
+
+SUBSCRIBER_KEY = 'task_sub:{}'
+SUBSCRIBER_TTL = 3600  # 秒；异常断开未能递减时兜底过期
+LOCAL_CACHE_SECONDS = 2.0
+
+_client = None
+_async_client = None
+_local_cache: dict[str, float] = {}  # task_id -> 正结果的过期时刻
+
+
+def _get_redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+    return _client
+
+
+def _get_async_redis():
+    global _async_client
+    if _async_client is None:
+        _async_client = aredis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+    return _async_client
+
+
+async def subscribe(task_id) -> None:
+    key = SUBSCRIBER_KEY.format(task_id)
+    try:
+        async with _get_async_redis().pipeline(transaction=True) as pipe:
+            pipe.incr(key)
+            pipe.expire(key, SUBSCRIBER_TTL)
+            await pipe.execute()
+    except redis.RedisError:
+        pass
+
+
+async def unsubscribe(task_id) -> None:
+    key = SUBSCRIBER_KEY.format(task_id)
+    try:
+        client = _get_async_redis()
+        if await client.decr(key) <= 0:
+            await client.delete(key)
+    except redis.RedisError:
+        pass
+
+
+def has_subscribers(task_id) -> bool:
+    """任务当前是否有 WebSocket 订阅者（仅正结果在进程内缓存 LOCAL_CACHE_SECONDS 秒）"""
+    task_id = str(task_id)
+    now = time.monotonic()
+    if _local_cache.get(task_id, 0.0) > now:
+        return True
+    try:
+        present = bool(_get_redis().exists(SUBSCRIBER_KEY.format(task_id)))
+    except redis.RedisError:
+        return True
+    if present:
+        if len(_local_cache) > 1024:
+            _local_cache.clear()
+        _local_cache[task_id] = now + LOCAL_CACHE_SECONDS
+    else:
+        _local_cache.pop(task_id, None)
+    return present
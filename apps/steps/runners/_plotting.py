@@ -0,0 +1,90 @@
+"""
+Runner 后台绘图线程
+
+matplotlib 渲染放到单独的线程中，与主线程的 H5AD 写出（h5py gzip 压缩时释放 GIL）及上传并行。
+Celery prefork 池的 worker 子进程为 daemonic，无法再创建子进程，因此这里不使用进程池。
+绘图直接使用 Figure + Agg 画布而不经 pyplot，不触碰 pyplot 的全局状态，可在非主线程安全执行。
+线程无法提交任务时退回在当前线程内同步绘制；绘图失败只影响可选的图片产物。
+"""
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# 等待绘图完成的上限（秒）
+PLOT_TIMEOUT = 60
+
+
+def plot_executor() -> ThreadPoolExecutor:
+    """单线程绘图池"""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='runner-plot')
+
+
+def submit_plot(executor, fn, *args) -> Future:
+    """提交绘图任务；线程池不可用时在当前线程同步执行，返回已完成的 Future"""
+    try:
+        return executor.submit(fn, *args)
+    except Exception:
+        logger.warning('Plot executor unavailable; rendering %s inline', fn.__name__, exc_info=True)
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def plot_succeeded(future) -> bool:
+    """等待绘图完成，返回是否成功"""
+    try:
+        future.result(timeout=PLOT_TIMEOUT)
+    except Exception:
+        return False
+    return True
+
+
+def _figure(figsize):
+    """新建挂在 Agg 画布上的 Figure（不注册到 pyplot，无需 close）"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def plot_hvg_scatter(x, y, mask, ylabel: str, title: str, out_path: str) -> None:
+    """均值-离散度散点，突出 HVG"""
+    fig = _figure((6, 5))
+    ax = fig.add_subplot()
+    ax.scatter(x, y, s=6, c='lightgray', alpha=0.6, label='Genes', rasterized=True)
+    if mask is not None and mask.any():
+        ax.scatter(x[mask], y[mask], s=8, c='red', alpha=0.8, label='HVGs', rasterized=True)
+    ax.set_xlabel('Mean Expression')
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(out_path, dpi=150, bbox_inches='tight')
+
+
+def plot_hvg_counts(n_hvgs: int, n_others: int, title: str, out_path: str) -> None:
+    """兜底：仅画 HVG 数量条形图"""
+    fig = _figure((4, 3))
+    ax = fig.add_subplot()
+    ax.bar(['HVGs', 'Others'], [n_hvgs, n_others], color=['red', 'lightgray'])
+    ax.set_ylabel('Gene Count')
+    ax.set_title(title)
+    fig.tight_layout()
+    fig.savefig(out_path, dpi=150, bbox_inches='tight')
+
+
+def plot_scree(var_ratio, out_path: str) -> None:
+    """PCA 解释方差比例（scree plot）"""
+    fig = _figure((6, 4))
+    ax = fig.add_subplot()
+    ax.plot(range(1, len(var_ratio) + 1), var_ratio, marker='o')
+    ax.set_xlabel('PC')
+    ax.set_ylabel('Explained Variance Ratio')
+    ax.set_title('PCA Scree Plot')
+    fig.tight_layout()
+    fig.savefig(out_path, dpi=150, bbox_inches='tight')
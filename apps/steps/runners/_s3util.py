@@ -0,0 +1,85 @@
+"""
+Runner 共用的 S3/MinIO 访问工具
+
+客户端按进程缓存（凭证解析、endpoint 解析与连接池只初始化一次）；
+连接池按分片传输并发数放大，避免 TransferManager 线程排队等待连接。
+boto3 在首次访问对象存储时才导入，导入 Runner 模块本身不承担其开销。
+"""
+import functools
+
+from django.conf import settings
+
+# Runner 内并发上传的产物数（每个产物内部再按 get_transfer_config() 分片并发）
+UPLOAD_WORKERS = 4
+
+
+@functools.lru_cache(maxsize=1)
+def get_transfer_config():
+    """统一的分片传输配置：超过 8MB 即按 64MB 分片并发（Range GET / 分片上传），并发数由 S3_MAX_CONCURRENCY 配置"""
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=8 * 1024 * 1024,
+        multipart_chunksize=64 * 1024 * 1024,
+        max_concurrency=settings.S3_MAX_CONCURRENCY,
+        use_threads=True,
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_s3_client():
+    """获取已配置的 S3/MinIO 客户端实例（进程内复用连接池与凭证）"""
+    import boto3
+    from botocore.client import Config
+    return boto3.client(
+        's3',
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        config=Config(
+            signature_version='s3v4',
+            max_pool_connections=max(32, settings.S3_MAX_CONCURRENCY),
+            retries={'max_attempts': 5, 'mode': 'adaptive'},
+            tcp_keepalive=True,
+        ),
+        region_name='us-east-1'
+    )
+
+
+def object_key(s3_path: str) -> str:
+    """兼容 s3://bucket/key 与 纯 key，返回对象 key"""
+    return s3_path.split('/', 3)[-1] if s3_path.startswith('s3://') else s3_path
+
+
+def download_from_s3(s3_path: str, local_path: str) -> None:
+    """从 S3/MinIO 下载对象到本地文件
+
+    Args:
+        s3_path: 可以是完整的 s3://bucket/key 或仅 key
+        local_path: 本地保存路径
+    """
+    get_s3_client().download_file(
+        settings.AWS_STORAGE_BUCKET_NAME, object_key(s3_path), local_path, Config=get_transfer_config()
+    )
+
+
+def upload_to_s3(local_path: str, key: str, content_type: str = 'application/octet-stream') -> None:
+    """上传本地文件到 S3/MinIO 指定 key
+
+    Args:
+        local_path: 本地文件路径
+        key: 目标对象 key（不要带 s3:// 前缀）
+        content_type: MIME 类型
+    """
+    get_s3_client().upload_file(
+        local_path, settings.AWS_STORAGE_BUCKET_NAME, key,
+        ExtraArgs={'ContentType': content_type}, Config=get_transfer_config(),
+    )
+
+
+def upload_succeeded(future) -> bool:
+    """等待后台提交的 upload_to_s3 完成，返回是否成功"""
+    try:
+        future.result()
+    except Exception:
+        return False
+    return True
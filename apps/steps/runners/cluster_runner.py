@@ -1,41 +1,52 @@
+import hashlib
 import os
 import tempfile
 from typing import Dict, Any, List
 
-import boto3
-from botocore.client import Config
 from django.conf import settings
 
-
-def get_s3_client():
-    """获取已配置的 S3/MinIO 客户端实例"""
-    return boto3.client(
-        's3',
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        config=Config(signature_version='s3v4'),
-        region_name='us-east-1'
-    )
-
-
-def download_from_s3(s3_path: str, local_path: str) -> None:
-    """从 S3/MinIO 下载对象到本地文件"""
-    s3 = get_s3_client()
-    bucket = settings.AWS_STORAGE_BUCKET_NAME
-    if s3_path.startswith('s3://'):
-        key = s3_path.split('/', 3)[-1]
-    else:
-        key = s3_path
-    s3.download_file(bucket, key, local_path)
-
-
-def upload_to_s3(local_path: str, key: str, content_type: str = 'application/octet-stream') -> None:
-    """上传本地文件到 S3/MinIO 指定 key"""
-    s3 = get_s3_client()
-    bucket = settings.AWS_STORAGE_BUCKET_NAME
-    with open(local_path, 'rb') as f:
-        s3.put_object(Bucket=bucket, Key=key, Body=f, ContentType=content_type)
+from ._s3util import download_from_s3, get_s3_client, object_key, upload_to_s3
+from ._tableio import H5AD_WRITE_OPTIONS
+
+# 输入缺少邻接图时补算所用参数（同时参与中间结果缓存 key）
+EMBEDDING_N_PCS = 50
+EMBEDDING_N_NEIGHBORS = 15
+# 聚类散点图最多绘制的细胞数
+SCATTER_MAX_POINTS = 100_000
+# 分层抽样时每个簇至少保留的点数（不足则全部保留）
+SCATTER_MIN_PER_CLUSTER = 2000
+
+
+def _upload_and_remove(local_path: str, key: str, content_type: str) -> int:
+    """上传后立即删除本地文件，临时目录同一时刻只保留一个产物；返回文件大小"""
+    size = os.path.getsize(local_path)
+    upload_to_s3(local_path, key, content_type)
+    os.remove(local_path)
+    return size
+
+
+def _stratified_sample(codes, max_points: int):
+    """按簇分层抽样：各簇按比例分配 max_points，且至少保留 SCATTER_MIN_PER_CLUSTER 个点"""
+    import numpy as np
+    rng = np.random.default_rng(0)
+    ratio = max_points / len(codes)
+    picks = []
+    for code in np.unique(codes):
+        members = np.flatnonzero(codes == code)
+        k = min(len(members), max(SCATTER_MIN_PER_CLUSTER, int(len(members) * ratio)))
+        picks.append(rng.choice(members, k, replace=False) if k < len(members) else members)
+    return np.sort(np.concatenate(picks))
+
+
+def _embedding_cache_key(data_uri: str) -> str | None:
+    """PCA/邻接图中间结果的缓存 key：由输入对象 key + ETag + 计算参数确定，对象内容变化即失效"""
+    key = object_key(data_uri)
+    try:
+        etag = get_s3_client().head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)['ETag'].strip('"')
+    except Exception:
+        return None
+    digest = hashlib.sha256(f'{key}|{etag}|pca{EMBEDDING_N_PCS}|nn{EMBEDDING_N_NEIGHBORS}'.encode()).hexdigest()
+    return f'cache/embeddings/{digest}.h5ad'
 
 
 def run_cluster(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
@@ -53,6 +64,8 @@ def run_cluster(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any
         import anndata as ad  # noqa: F401
         import numpy as np
         import pandas as pd
+        import matplotlib
+        matplotlib.use('Agg')  # 固定非交互式后端，worker 无显示环境且免去后端探测
         import matplotlib.pyplot as plt
         import seaborn as sns
     except ImportError as e:
@@ -67,11 +80,14 @@ def run_cluster(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any
     method = (params or {}).get('method', 'leiden')
 
     with tempfile.TemporaryDirectory() as tmpdir:
-        in_local = os.path.join(tmpdir, 'input.h5ad')
-        try:
-            download_from_s3(data_uri, in_local)
-        except Exception as e:
-            return {'artifacts': [], 'metrics': {'error': f'Failed to download input: {str(e)}'}, 'evidence': {}}
+        # 任务层提供的本地缓存副本（只读），否则下载到临时目录
+        in_local = inputs.get('local_path')
+        if not in_local:
+            in_local = os.path.join(tmpdir, 'input.h5ad')
+            try:
+                download_from_s3(data_uri, in_local)
+            except Exception as e:
+                return {'artifacts': [], 'metrics': {'error': f'Failed to download input: {str(e)}'}, 'evidence': {}}
 
         try:
             sc.settings.verbosity = 0
@@ -79,15 +95,37 @@ def run_cluster(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any
         except Exception as e:
             return {'artifacts': [], 'metrics': {'error': f'Failed to read H5AD: {str(e)}'}, 'evidence': {}}
 
-        # 准备邻接图
-        try:
-            if 'X_pca' not in adata.obsm:
-                sc.pp.scale(adata, max_value=10)
-                sc.pp.pca(adata, n_comps=50)
-            if 'neighbors' not in adata.uns:
-                sc.pp.neighbors(adata, n_neighbors=15, use_rep='X_pca')
-        except Exception:
-            pass
+        # 准备邻接图：输入缺少 PCA/邻接图时优先复用同一输入对象（按 ETag）已缓存的结果
+        if 'X_pca' not in adata.obsm or 'neighbors' not in adata.uns:
+            cache_key = _embedding_cache_key(data_uri)
+            cached_local = os.path.join(tmpdir, 'embedding_cache.h5ad')
+            cached = False
+            if cache_key:
+                try:
+                    download_from_s3(cache_key, cached_local)
+                    adata = sc.read_h5ad(cached_local)
+                    cached = True
+                except Exception:
+                    pass
+            if not cached:
+                try:
+                    if 'X_pca' not in adata.obsm:
+                        sc.pp.scale(adata, max_value=10)
+                        sc.pp.pca(adata, n_comps=EMBEDDING_N_PCS)
+                    if 'neighbors' not in adata.uns:
+                        sc.pp.neighbors(adata, n_neighbors=EMBEDDING_N_NEIGHBORS, use_rep='X_pca')
+                except Exception:
+                    pass
+                else:
+                    if cache_key:
+                        # 缓存写入失败不影响本次聚类
+                        try:
+                            adata.write_h5ad(cached_local)
+                            upload_to_s3(cached_local, cache_key, 'application/octet-stream')
+                        except Exception:
+                            pass
+            if os.path.exists(cached_local):
+                os.remove(cached_local)
 
         # 聚类
         try:
@@ -100,52 +138,71 @@ def run_cluster(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any
         except Exception as e:
             return {'artifacts': [], 'metrics': {'error': f'Failed to cluster: {str(e)}'}, 'evidence': {}}
 
-        # 保存labels
-        labels_local = os.path.join(tmpdir, 'cluster_labels.csv')
+        # 产物按 labels（最小）→ png → h5ad（最大）顺序逐个写出、上传并删除本地文件
+        labels_s3 = f'artifacts/{step_run_id}/cluster_labels.csv.gz'
+        out_s3 = f'artifacts/{step_run_id}/clustered.h5ad'
+        scatter_s3 = f'artifacts/{step_run_id}/cluster_umap.png'
+        upload_error = {'artifacts': [], 'metrics': {'error': 'Failed to upload cluster artifacts'}, 'evidence': {}}
+
+        # 保存labels：保持 category 类型（不物化逐细胞字符串数组），gzip 压缩 CSV
+        labels_local = os.path.join(tmpdir, 'cluster_labels.csv.gz')
         try:
-            labels = adata.obs[cluster_key].astype(str)
-            labels.to_csv(labels_local, header=True)
+            labels = adata.obs[cluster_key]
+            adata.obs[[cluster_key]].to_csv(labels_local, header=True, compression='gzip')
         except Exception as e:
             return {'artifacts': [], 'metrics': {'error': f'Failed to write labels: {str(e)}'}, 'evidence': {}}
+        try:
+            labels_size = _upload_and_remove(labels_local, labels_s3, 'application/gzip')
+        except Exception:
+            return upload_error
 
         # 基于UMAP绘制带颜色的散点
         scatter_local = os.path.join(tmpdir, 'cluster_umap.png')
+        plotted = None  # 抽样绘制时的点数
         try:
             if 'X_umap' not in adata.obsm:
                 sc.tl.umap(adata)
             plt.figure(figsize=(6,5))
-            cats = sorted(labels.unique())
-            palette = sns.color_palette('tab20', n_colors=len(cats))
-            color_map = {c: palette[i] for i, c in enumerate(cats)}
-            colors = [color_map[v] for v in labels]
-            plt.scatter(adata.obsm['X_umap'][:,0], adata.obsm['X_umap'][:,1], s=4, c=colors, alpha=0.8)
+            # 类别编码直接索引调色板数组，避免逐细胞的 Python 字典查找
+            cats = pd.Categorical(labels)
+            palette = np.asarray(sns.color_palette('tab20', n_colors=len(cats.categories)))
+            colors = palette[cats.codes]
+            coords = adata.obsm['X_umap']
+            if len(coords) > SCATTER_MAX_POINTS:
+                # 超大数据集按簇分层抽样绘制，小簇不被淹没，绘制耗时与 PNG 体积受控
+                idx = _stratified_sample(cats.codes, SCATTER_MAX_POINTS)
+                coords, colors = coords[idx], colors[idx]
+                plotted = len(idx)
+            # 点层栅格化，避免逐点绘制开销；屏幕查看 150 dpi 已足够
+            plt.scatter(coords[:,0], coords[:,1], s=4, c=colors, alpha=0.8, rasterized=True)
             plt.xlabel('UMAP1')
             plt.ylabel('UMAP2')
             plt.title(f'Clusters ({cluster_key})')
             plt.tight_layout()
-            plt.savefig(scatter_local, dpi=300, bbox_inches='tight')
+            plt.savefig(scatter_local, dpi=150, bbox_inches='tight')
             plt.close()
         except Exception:
             scatter_local = None
+            plotted = None
+        scatter_size = None
+        if scatter_local:
+            try:
+                scatter_size = _upload_and_remove(scatter_local, scatter_s3, 'image/png')
+            except Exception:
+                return upload_error
+        else:
+            scatter_s3 = None
 
         # 保存H5AD
         out_local = os.path.join(tmpdir, 'clustered.h5ad')
         try:
-            adata.write_h5ad(out_local)
+            adata.write_h5ad(out_local, **H5AD_WRITE_OPTIONS)
         except Exception as e:
             return {'artifacts': [], 'metrics': {'error': f'Failed to write output H5AD: {str(e)}'}, 'evidence': {}}
-
-        # 上传
-        labels_s3 = f'artifacts/{step_run_id}/cluster_labels.csv'
-        out_s3 = f'artifacts/{step_run_id}/clustered.h5ad'
-        scatter_s3 = f'artifacts/{step_run_id}/cluster_umap.png' if scatter_local else None
         try:
-            upload_to_s3(labels_local, labels_s3, 'text/csv')
-            upload_to_s3(out_local, out_s3, 'application/octet-stream')
-            if scatter_local:
-                upload_to_s3(scatter_local, scatter_s3, 'image/png')
+            out_size = _upload_and_remove(out_local, out_s3, 'application/octet-stream')
         except Exception:
-            return {'artifacts': [], 'metrics': {'error': 'Failed to upload cluster artifacts'}, 'evidence': {}}
+            return upload_error
 
         n_clusters = int(len(set(labels)))
         metrics = {
@@ -157,11 +214,13 @@ def run_cluster(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any
             'cluster_umap': scatter_s3,
             'summary': f'Clustering with {method} (resolution={resolution}) produced {n_clusters} clusters.'
         }
+        if plotted is not None:
+            evidence['summary'] += f' UMAP plot shows a per-cluster sample of {plotted} of {adata.n_obs} cells.'
         artifacts: List[Dict[str, Any]] = [
-            {'name': 'cluster_labels.csv', 'type': 'csv', 'path': labels_s3},
-            {'name': 'clustered.h5ad', 'type': 'h5ad', 'path': out_s3},
+            {'name': 'cluster_labels.csv.gz', 'type': 'csv', 'path': labels_s3, 'size': labels_size},
+            {'name': 'clustered.h5ad', 'type': 'h5ad', 'path': out_s3, 'size': out_size},
         ]
         if scatter_s3:
-            artifacts.append({'name': 'cluster_umap.png', 'type': 'png', 'path': scatter_s3})
+            artifacts.append({'name': 'cluster_umap.png', 'type': 'png', 'path': scatter_s3, 'size': scatter_size})
 
         return {'artifacts': artifacts, 'metrics': metrics, 'evidence': evidence}
\ No newline at end of file
@@ -1,53 +1,11 @@
 import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
 
-import boto3
-from botocore.client import Config
-from django.conf import settings
-
-
-def get_s3_client():
-    """获取已配置的 S3/MinIO 客户端实例"""
-    return boto3.client(
-        's3',
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        config=Config(signature_version='s3v4'),
-        region_name='us-east-1'
-    )
-
-
-def download_from_s3(s3_path: str, local_path: str) -> None:
-    """从 S3/MinIO 下载对象到本地文件
-
-    Args:
-        s3_path: 可以是完整的 s3://bucket/key 或仅 key
-        local_path: 本地保存路径
-    """
-    s3 = get_s3_client()
-    bucket = settings.AWS_STORAGE_BUCKET_NAME
-    # 兼容 s3://bucket/key 与 纯 key
-    if s3_path.startswith('s3://'):
-        key = s3_path.split('/', 3)[-1]
-    else:
-        key = s3_path
-    s3.download_file(bucket, key, local_path)
-
-
-def upload_to_s3(local_path: str, key: str, content_type: str = 'application/octet-stream') -> None:
-    """上传本地文件到 S3/MinIO 指定 key
-
-    Args:
-        local_path: 本地文件路径
-        key: 目标对象 key（不要带 s3:// 前缀）
-        content_type: MIME 类型
-    """
-    s3 = get_s3_client()
-    bucket = settings.AWS_STORAGE_BUCKET_NAME
-    with open(local_path, 'rb') as f:
-        s3.put_object(Bucket=bucket, Key=key, Body=f, ContentType=content_type)
+from ._plotting import plot_executor, plot_hvg_counts, plot_hvg_scatter, plot_succeeded, submit_plot
+from ._s3util import UPLOAD_WORKERS, download_from_s3, upload_succeeded, upload_to_s3
+from ._tableio import H5AD_WRITE_OPTIONS, write_csv
 
 
 def run_hvg(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
@@ -58,7 +16,8 @@ def run_hvg(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
         params: HVG 参数，例如 {
             'method': 'seurat_v3|pearson|cell_ranger',
             'n_top_genes': 2000,
-            'batch_key': Optional[str]
+            'batch_key': Optional[str],
+            'subset_to_hvg': bool  # 默认 True，输出 H5AD 仅保留 HVG，下游 PCA 等步骤只看到 HVG
         }
 
     返回:
@@ -72,7 +31,6 @@ def run_hvg(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
         import anndata as ad  # noqa: F401  # 仅确保依赖存在
         import pandas as pd
         import numpy as np
-        import matplotlib.pyplot as plt
     except ImportError as e:
         return {
             'artifacts': [],
@@ -92,18 +50,29 @@ def run_hvg(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
     method = (params or {}).get('method', 'seurat_v3')
     n_top_genes = int((params or {}).get('n_top_genes', 2000))
     batch_key = (params or {}).get('batch_key')
-
-    with tempfile.TemporaryDirectory() as tmpdir:
+    # run_step 已按 PARAM_SCHEMAS 解析为 bool（'false'/'0' 等字符串不会被当作真值）
+    subset_to_hvg = (params or {}).get('subset_to_hvg', True) is not False
+
+    # 产物写出后即提交后台上传，与后续写盘重叠；图在后台线程中绘制，与 CSV/H5AD 写出并行。
+    # 绘图与上传线程池先于临时目录退出（等待绘图与上传结束）
+    with (
+        tempfile.TemporaryDirectory() as tmpdir,
+        ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool,
+        plot_executor() as plot_pool,
+    ):
         # 1) 下载输入数据
-        local_in = os.path.join(tmpdir, 'input.h5ad')
-        try:
-            download_from_s3(data_uri, local_in)
-        except Exception as e:
-            return {
-                'artifacts': [],
-                'metrics': {'error': f'Failed to download input: {str(e)}'},
-                'evidence': {}
-            }
+        # 任务层提供的本地缓存副本（只读），否则下载到临时目录
+        local_in = inputs.get('local_path')
+        if not local_in:
+            local_in = os.path.join(tmpdir, 'input.h5ad')
+            try:
+                download_from_s3(data_uri, local_in)
+            except Exception as e:
+                return {
+                    'artifacts': [],
+                    'metrics': {'error': f'Failed to download input: {str(e)}'},
+                    'evidence': {}
+                }
 
         # 2) 读取数据
         try:
@@ -153,57 +122,67 @@ def run_hvg(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
                 disp_col = c
                 break
 
-        # 5) 可视化：均值-离散度散点，突出HVG
+        # 5) 可视化：均值-离散度散点，突出HVG（后台线程绘制，仅传递所需的 NumPy 数组）
         hvg_plot_local = os.path.join(tmpdir, 'hvg_plot.png')
+        plot_title = f'HVG selection ({method_used})'
         try:
             if means_col and disp_col:
-                plt.figure(figsize=(6, 5))
-                x = adata.var[means_col]
-                y = adata.var[disp_col]
-                plt.scatter(x, y, s=6, c='lightgray', alpha=0.6, label='Genes')
-                if hv_mask is not None and hv_mask.any():
-                    plt.scatter(x[hv_mask], y[hv_mask], s=8, c='red', alpha=0.8, label='HVGs')
-                plt.xlabel('Mean Expression')
-                plt.ylabel(disp_col)
-                plt.title(f'HVG selection ({method_used})')
-                plt.legend()
-                plt.tight_layout()
-                plt.savefig(hvg_plot_local, dpi=300, bbox_inches='tight')
-                plt.close()
+                plot_future = submit_plot(
+                    plot_pool, plot_hvg_scatter,
+                    adata.var[means_col].to_numpy(np.float32),
+                    adata.var[disp_col].to_numpy(np.float32),
+                    hv_mask.to_numpy(bool) if hv_mask is not None else None,
+                    disp_col, plot_title, hvg_plot_local,
+                )
             else:
                 # 兜底：仅画 HVG 数量条形图
-                plt.figure(figsize=(4, 3))
-                plt.bar(['HVGs', 'Others'], [n_hvgs, max(0, adata.n_vars - n_hvgs)], color=['red', 'lightgray'])
-                plt.ylabel('Gene Count')
-                plt.title(f'HVG selection ({method_used})')
-                plt.tight_layout()
-                plt.savefig(hvg_plot_local, dpi=300, bbox_inches='tight')
-                plt.close()
+                plot_future = submit_plot(
+                    plot_pool, plot_hvg_counts, n_hvgs, max(0, adata.n_vars - n_hvgs), plot_title, hvg_plot_local
+                )
         except Exception:
             # 忽略绘图错误，不阻断流程
-            hvg_plot_local = None
+            plot_future = None
 
         # 6) 保存基因列表与排名
         genes_csv_local = os.path.join(tmpdir, 'hvg_genes.csv')
         ranking_csv_local = os.path.join(tmpdir, 'hvg_ranking.csv')
         try:
-            pd.Series(hv_genes, name='gene').to_csv(genes_csv_local, index=False)
-            # 排名表：若无 rank 列，按是否HVG排序
-            df_rank = adata.var.copy()
-            df_rank = df_rank.reset_index().rename(columns={'index': 'gene'})
-            if rank_col is None:
-                df_rank['highly_variable_rank'] = (~df_rank['highly_variable']).astype(int)  # HVG优先
-            df_rank[['gene', 'highly_variable', 'highly_variable_rank']].sort_values(
-                by=['highly_variable', 'highly_variable_rank'], ascending=[False, True]
-            ).to_csv(ranking_csv_local, index=False)
+            # 单列基因名直接按行写出文本，不经 pandas（基因符号不含逗号/引号，无需 CSV 转义）
+            with open(genes_csv_local, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(['gene', *hv_genes]) + '\n')
+            # 排名表：只取所需三列构造（不复制整个 adata.var）；若无 rank 列，按是否HVG排序
+            hv_flags = adata.var['highly_variable'].to_numpy(bool)
+            df_rank = pd.DataFrame({
+                'gene': adata.var_names.to_numpy(),
+                'highly_variable': hv_flags,
+                'highly_variable_rank': (
+                    adata.var[rank_col].to_numpy() if rank_col else 1 - hv_flags.view(np.int8)  # HVG优先；bool 按字节视为 0/1，单次减法
+                ),
+            })
+            df_rank.sort_values(
+                by=['highly_variable', 'highly_variable_rank'], ascending=[False, True],
+                inplace=True, kind='mergesort',
+            )
+            write_csv(df_rank, ranking_csv_local)
         except Exception:
             # 允许排名文件失败，不影响主流程
             ranking_csv_local = None
+        genes_csv_s3 = f'artifacts/{step_run_id}/hvg_genes.csv'
+        ranking_csv_s3 = f'artifacts/{step_run_id}/hvg_ranking.csv' if ranking_csv_local else None
+        genes_upload = pool.submit(upload_to_s3, genes_csv_local, genes_csv_s3, 'text/csv')
+        ranking_upload = pool.submit(upload_to_s3, ranking_csv_local, ranking_csv_s3, 'text/csv') if ranking_csv_local else None
 
         # 7) 写出更新后的 H5AD（保留 HVG 标记供下游步骤使用）
+        #    下游 PCA 等只使用 HVG，默认仅写出 HVG 子集；全基因掩码按位压缩存入 uns，便于复现
         out_h5ad_local = os.path.join(tmpdir, 'hvg_processed.h5ad')
         try:
-            adata.write_h5ad(out_h5ad_local)
+            out_adata = adata
+            if subset_to_hvg and hv_mask is not None and n_hvgs:
+                mask_values = hv_mask.to_numpy(bool)
+                out_adata = adata[:, mask_values].copy()
+                out_adata.uns['hvg_full_mask'] = np.packbits(mask_values)
+                out_adata.uns['hvg_full_n_vars'] = int(adata.n_vars)
+            out_adata.write_h5ad(out_h5ad_local, **H5AD_WRITE_OPTIONS)
         except Exception as e:
             return {
                 'artifacts': [],
@@ -211,33 +190,28 @@ def run_hvg(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
                 'evidence': {}
             }
 
-        # 8) 上传产物到 S3
-        hvg_plot_s3 = f'artifacts/{step_run_id}/hvg_plot.png' if hvg_plot_local else None
-        genes_csv_s3 = f'artifacts/{step_run_id}/hvg_genes.csv'
-        ranking_csv_s3 = f'artifacts/{step_run_id}/hvg_ranking.csv' if ranking_csv_local else None
         out_h5ad_s3 = f'artifacts/{step_run_id}/hvg_processed.h5ad'
-
-        if hvg_plot_local:
-            try:
-                upload_to_s3(hvg_plot_local, hvg_plot_s3, 'image/png')
-            except Exception:
-                hvg_plot_s3 = None
-        try:
-            upload_to_s3(genes_csv_local, genes_csv_s3, 'text/csv')
-        except Exception:
+        h5ad_upload = pool.submit(upload_to_s3, out_h5ad_local, out_h5ad_s3, 'application/octet-stream')
+
+        # 图就绪后再上传；绘图失败不阻断流程
+        if plot_future is not None and plot_succeeded(plot_future):
+            hvg_plot_s3 = f'artifacts/{step_run_id}/hvg_plot.png'
+            plot_upload = pool.submit(upload_to_s3, hvg_plot_local, hvg_plot_s3, 'image/png')
+        else:
+            hvg_plot_s3 = plot_upload = None
+
+        # 8) 收取上传结果：基因列表与 H5AD 为必需产物，图与排名表失败时降级为 None
+        if plot_upload and not upload_succeeded(plot_upload):
+            hvg_plot_s3 = None
+        if not upload_succeeded(genes_upload):
             return {
                 'artifacts': [],
                 'metrics': {'error': 'Failed to upload HVG genes csv'},
                 'evidence': {}
             }
-        if ranking_csv_local:
-            try:
-                upload_to_s3(ranking_csv_local, ranking_csv_s3, 'text/csv')
-            except Exception:
-                ranking_csv_s3 = None
-        try:
-            upload_to_s3(out_h5ad_local, out_h5ad_s3, 'application/octet-stream')
-        except Exception:
+        if ranking_upload and not upload_succeeded(ranking_upload):
+            ranking_csv_s3 = None
+        if not upload_succeeded(h5ad_upload):
             return {
                 'artifacts': [],
                 'metrics': {'error': 'Failed to upload output H5AD'},
@@ -256,13 +230,13 @@ def run_hvg(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
             'summary': f'Selected {n_hvgs} HVGs using {method_used} (n_top_genes={n_top_genes})'
         }
         artifacts: List[Dict[str, Any]] = [
-            {'name': 'hvg_genes.csv', 'type': 'csv', 'path': genes_csv_s3},
-            {'name': 'hvg_processed.h5ad', 'type': 'h5ad', 'path': out_h5ad_s3},
+            {'name': 'hvg_genes.csv', 'type': 'csv', 'path': genes_csv_s3, 'size': os.path.getsize(genes_csv_local)},
+            {'name': 'hvg_processed.h5ad', 'type': 'h5ad', 'path': out_h5ad_s3, 'size': os.path.getsize(out_h5ad_local)},
         ]
         if hvg_plot_s3:
-            artifacts.append({'name': 'hvg_plot.png', 'type': 'png', 'path': hvg_plot_s3})
+            artifacts.append({'name': 'hvg_plot.png', 'type': 'png', 'path': hvg_plot_s3, 'size': os.path.getsize(hvg_plot_local)})
         if ranking_csv_s3:
-            artifacts.append({'name': 'hvg_ranking.csv', 'type': 'csv', 'path': ranking_csv_s3})
+            artifacts.append({'name': 'hvg_ranking.csv', 'type': 'csv', 'path': ranking_csv_s3, 'size': os.path.getsize(ranking_csv_local)})
 
         return {
             'artifacts': artifacts,
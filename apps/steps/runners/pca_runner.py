@@ -1,41 +1,14 @@
+import logging
 import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
 
-import boto3
-from botocore.client import Config
-from django.conf import settings
+from ._plotting import plot_executor, plot_scree, plot_succeeded, submit_plot
+from ._s3util import UPLOAD_WORKERS, download_from_s3, upload_succeeded, upload_to_s3
+from ._tableio import H5AD_WRITE_OPTIONS, parquet_available, write_csv, write_parquet
 
-
-def get_s3_client():
-    """获取已配置的 S3/MinIO 客户端实例"""
-    return boto3.client(
-        's3',
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        config=Config(signature_version='s3v4'),
-        region_name='us-east-1'
-    )
-
-
-def download_from_s3(s3_path: str, local_path: str) -> None:
-    """从 S3/MinIO 下载对象到本地文件"""
-    s3 = get_s3_client()
-    bucket = settings.AWS_STORAGE_BUCKET_NAME
-    if s3_path.startswith('s3://'):
-        key = s3_path.split('/', 3)[-1]
-    else:
-        key = s3_path
-    s3.download_file(bucket, key, local_path)
-
-
-def upload_to_s3(local_path: str, key: str, content_type: str = 'application/octet-stream') -> None:
-    """上传本地文件到 S3/MinIO 指定 key"""
-    s3 = get_s3_client()
-    bucket = settings.AWS_STORAGE_BUCKET_NAME
-    with open(local_path, 'rb') as f:
-        s3.put_object(Bucket=bucket, Key=key, Body=f, ContentType=content_type)
+logger = logging.getLogger(__name__)
 
 
 def run_pca(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
@@ -43,7 +16,7 @@ def run_pca(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
 
     Args:
         inputs: {'data_uri': <S3 key or s3://...>, 'step_run_id': str}
-        params: {'n_components': int, 'svd_solver': str}
+        params: {'n_components': int, 'svd_solver': str, 'embedding_format': 'parquet'|'csv'}
 
     Returns:
         dict with artifacts, metrics, evidence
@@ -52,8 +25,6 @@ def run_pca(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
         import scanpy as sc
         import anndata as ad  # noqa: F401
         import numpy as np
-        import pandas as pd
-        import matplotlib.pyplot as plt
     except ImportError as e:
         return {'artifacts': [], 'metrics': {'error': f'Missing required packages: {str(e)}'}, 'evidence': {}}
 
@@ -63,27 +34,44 @@ def run_pca(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
         return {'artifacts': [], 'metrics': {'error': 'PCA requires input H5AD: inputs["data_uri"] missing'}, 'evidence': {}}
 
     n_components = int((params or {}).get('n_components', 50))
-    svd_solver = (params or {}).get('svd_solver', 'arpack')
-
-    with tempfile.TemporaryDirectory() as tmpdir:
-        in_local = os.path.join(tmpdir, 'input.h5ad')
-        try:
-            download_from_s3(data_uri, in_local)
-        except Exception as e:
-            return {'artifacts': [], 'metrics': {'error': f'Failed to download input: {str(e)}'}, 'evidence': {}}
+    svd_solver = (params or {}).get('svd_solver', 'randomized')
+    # 嵌入默认写 Parquet（二进制 float32 + zstd，体积约为 CSV 的 1/5~1/10，依赖 requirements.txt 中的 pyarrow）；
+    # 显式要求时写 CSV。缺少 pyarrow 的环境降级为 CSV 并记录告警，实际格式见 metrics['embedding_format']
+    emb_format = 'csv' if (params or {}).get('embedding_format') == 'csv' else 'parquet'
+    if emb_format == 'parquet' and not parquet_available():
+        logger.warning('pyarrow not installed; writing PCA embeddings for step run %s as CSV', step_run_id)
+        emb_format = 'csv'
+
+    # 产物写出后即提交后台上传，与后续写盘重叠；scree 图在后台线程中绘制，与嵌入/H5AD 写出并行。
+    # 绘图与上传线程池先于临时目录退出（等待绘图与上传结束）
+    with (
+        tempfile.TemporaryDirectory() as tmpdir,
+        ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool,
+        plot_executor() as plot_pool,
+    ):
+        # 任务层提供的本地缓存副本（只读），否则下载到临时目录
+        in_local = inputs.get('local_path')
+        if not in_local:
+            in_local = os.path.join(tmpdir, 'input.h5ad')
+            try:
+                download_from_s3(data_uri, in_local)
+            except Exception as e:
+                return {'artifacts': [], 'metrics': {'error': f'Failed to download input: {str(e)}'}, 'evidence': {}}
 
         try:
             adata = sc.read_h5ad(in_local)
         except Exception as e:
             return {'artifacts': [], 'metrics': {'error': f'Failed to read H5AD: {str(e)}'}, 'evidence': {}}
 
-        # 执行 PCA
+        # 执行 PCA：float32 输入使 scale/SVD 的内存带宽减半；randomized SVD 对细胞×基因的瘦高矩阵远快于 arpack
+        if adata.X.dtype == np.float64:
+            adata.X = adata.X.astype(np.float32)
         try:
             sc.pp.scale(adata, max_value=10)
         except Exception:
             pass
         try:
-            sc.pp.pca(adata, n_comps=n_components, svd_solver=svd_solver)
+            sc.pp.pca(adata, n_comps=n_components, svd_solver=svd_solver, random_state=0)
         except Exception as e:
             return {'artifacts': [], 'metrics': {'error': f'Failed to run PCA: {str(e)}'}, 'evidence': {}}
 
@@ -95,72 +83,78 @@ def run_pca(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
             var_ratio = None
         explained_sum = float(sum(var_ratio[:min(n_components, len(var_ratio))])) if var_ratio is not None else 0.0
 
-        # Scree plot
+        # Scree plot（后台线程绘制，仅传递方差比例数组）
         scree_local = os.path.join(tmpdir, 'pca_scree_plot.png')
-        try:
-            if var_ratio is not None:
-                plt.figure(figsize=(6, 4))
-                x = list(range(1, len(var_ratio) + 1))
-                plt.plot(x, var_ratio, marker='o')
-                plt.xlabel('PC')
-                plt.ylabel('Explained Variance Ratio')
-                plt.title('PCA Scree Plot')
-                plt.tight_layout()
-                plt.savefig(scree_local, dpi=300, bbox_inches='tight')
-                plt.close()
-        except Exception:
-            scree_local = None
+        scree_future = submit_plot(plot_pool, plot_scree, np.asarray(var_ratio), scree_local) if var_ratio is not None else None
 
-        # Embeddings CSV
-        emb_local = os.path.join(tmpdir, 'pca_embeddings.csv')
+        # Embeddings（Parquet 或 CSV）
+        emb_name = f'pca_embeddings.{emb_format}'
+        emb_local = os.path.join(tmpdir, emb_name)
         try:
             X_pca = adata.obsm.get('X_pca')
             if X_pca is None:
                 raise ValueError('X_pca not found')
-            df = pd.DataFrame(X_pca, index=adata.obs_names)
-            df.columns = [f'PC{i+1}' for i in range(df.shape[1])]
-            df.to_csv(emb_local)
+            # 直接按列从 NumPy 数组写出，不经 pandas 中间表；
+            # 细胞名为显式的首列 cell（旧版 CSV 中该列为 pandas 写出的无名索引列）
+            columns = {'cell': adata.obs_names.to_numpy()}
+            if emb_format == 'parquet':
+                columns.update(
+                    (f'PC{i+1}', np.ascontiguousarray(X_pca[:, i], dtype=np.float32)) for i in range(X_pca.shape[1])
+                )
+                write_parquet(columns, emb_local)
+            else:
+                columns.update((f'PC{i+1}', np.ascontiguousarray(X_pca[:, i])) for i in range(X_pca.shape[1]))
+                write_csv(columns, emb_local)
         except Exception as e:
             return {'artifacts': [], 'metrics': {'error': f'Failed to write PCA embeddings: {str(e)}'}, 'evidence': {}}
+        emb_s3 = f'artifacts/{step_run_id}/{emb_name}'
+        emb_content_type = 'application/vnd.apache.parquet' if emb_format == 'parquet' else 'text/csv'
+        emb_upload = pool.submit(upload_to_s3, emb_local, emb_s3, emb_content_type)
 
         # 写出更新后的H5AD
         out_local = os.path.join(tmpdir, 'pca_processed.h5ad')
         try:
-            adata.write_h5ad(out_local)
+            adata.write_h5ad(out_local, **H5AD_WRITE_OPTIONS)
         except Exception as e:
             return {'artifacts': [], 'metrics': {'error': f'Failed to write output H5AD: {str(e)}'}, 'evidence': {}}
 
-        # 上传
-        scree_s3 = f'artifacts/{step_run_id}/pca_scree_plot.png' if scree_local else None
-        emb_s3 = f'artifacts/{step_run_id}/pca_embeddings.csv'
         out_s3 = f'artifacts/{step_run_id}/pca_processed.h5ad'
-        if scree_local:
-            try:
-                upload_to_s3(scree_local, scree_s3, 'image/png')
-            except Exception:
-                scree_s3 = None
-        try:
-            upload_to_s3(emb_local, emb_s3, 'text/csv')
-            upload_to_s3(out_local, out_s3, 'application/octet-stream')
-        except Exception:
+        out_upload = pool.submit(upload_to_s3, out_local, out_s3, 'application/octet-stream')
+
+        # scree 图就绪后再上传；绘图失败不阻断流程
+        if scree_future is not None and plot_succeeded(scree_future):
+            scree_s3 = f'artifacts/{step_run_id}/pca_scree_plot.png'
+            scree_upload = pool.submit(upload_to_s3, scree_local, scree_s3, 'image/png')
+        else:
+            scree_s3 = scree_upload = None
+
+        # 收取上传结果：嵌入与 H5AD 为必需产物，scree 图失败时降级为 None
+        if scree_upload and not upload_succeeded(scree_upload):
+            scree_s3 = None
+        if not (upload_succeeded(emb_upload) and upload_succeeded(out_upload)):
             return {'artifacts': [], 'metrics': {'error': 'Failed to upload PCA artifacts'}, 'evidence': {}}
 
         # 顶级载荷（前两个PC）
         top_loadings: Dict[str, Dict[str, float]] = {}
         try:
-            import numpy as np
             loadings = adata.varm.get('PCs')  # genes x comps
             if loadings is not None:
-                genes = adata.var_names.tolist()
-                for i in range(min(2, loadings.shape[1])):
-                    comp = loadings[:, i]
-                    idx = np.argsort(-np.abs(comp))[:10]
-                    top_loadings[f'PC{i+1}'] = {genes[j]: float(comp[j]) for j in idx}
+                genes = adata.var_names
+                head = np.asarray(loadings[:, :2])
+                abs_head = np.abs(head)
+                k = min(10, head.shape[0])
+                # 所有 PC 一次 argpartition（O(n)）取前 k，再仅对这 k 个排序
+                part = np.argpartition(abs_head, -k, axis=0)[-k:]
+                order = np.take_along_axis(part, np.argsort(-np.take_along_axis(abs_head, part, axis=0), axis=0), axis=0)
+                for i in range(head.shape[1]):
+                    idx = order[:, i]
+                    top_loadings[f'PC{i+1}'] = {genes[j]: float(head[j, i]) for j in idx}
         except Exception:
             pass
 
         metrics = {
             'n_components': n_components,
+            'embedding_format': emb_format,
             'explained_variance_ratio_sum': explained_sum,
             'top_pc_loadings': top_loadings
         }
@@ -169,10 +163,10 @@ def run_pca(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
             'summary': f'PCA computed with n_components={n_components}, explained variance sum={explained_sum:.3f}'
         }
         artifacts: List[Dict[str, Any]] = [
-            {'name': 'pca_embeddings.csv', 'type': 'csv', 'path': emb_s3},
-            {'name': 'pca_processed.h5ad', 'type': 'h5ad', 'path': out_s3},
+            {'name': emb_name, 'type': emb_format, 'path': emb_s3, 'size': os.path.getsize(emb_local)},
+            {'name': 'pca_processed.h5ad', 'type': 'h5ad', 'path': out_s3, 'size': os.path.getsize(out_local)},
         ]
         if scree_s3:
-            artifacts.append({'name': 'pca_scree_plot.png', 'type': 'png', 'path': scree_s3})
+            artifacts.append({'name': 'pca_scree_plot.png', 'type': 'png', 'path': scree_s3, 'size': os.path.getsize(scree_local)})
 
         return {'artifacts': artifacts, 'metrics': metrics, 'evidence': evidence}
\ No newline at end of file
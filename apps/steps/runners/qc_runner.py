@@ -1,8 +1,6 @@
 import json
 import os
 import tempfile
-import boto3
-from botocore.client import Config
 from dataclasses import dataclass
 from typing import Dict, Any, Tuple, Optional
 import zipfile
@@ -11,13 +9,16 @@ import shutil
 import gzip
 try:
     import numpy as np
+    import matplotlib
+    matplotlib.use('Agg')  # 固定非交互式后端，worker 无显示环境且免去后端探测
     import matplotlib.pyplot as plt
     import seaborn as sns
 except Exception:
     np = None
     plt = None
     sns = None
-from django.conf import settings
+
+from ._s3util import download_from_s3, upload_to_s3
 
 
 @dataclass
@@ -26,38 +27,6 @@ class RunnerIO:
     params: Dict[str, Any]
 
 
-def get_s3_client():
-    """获取S3客户端实例"""
-    return boto3.client(
-        's3',
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        config=Config(signature_version='s3v4'),
-        region_name='us-east-1'
-    )
-
-
-def download_from_s3(s3_path: str, local_path: str):
-    """从S3下载文件到本地"""
-    s3 = get_s3_client()
-    bucket = settings.AWS_STORAGE_BUCKET_NAME
-    # 移除s3://bucket_name前缀，获取纯key
-    if s3_path.startswith('s3://'):
-        key = s3_path.split('/', 3)[-1]  # s3://bucket/path -> path
-    else:
-        key = s3_path
-    s3.download_file(bucket, key, local_path)
-
-
-def upload_to_s3(local_path: str, s3_path: str, content_type: str = 'application/octet-stream'):
-    """上传本地文件到S3"""
-    s3 = get_s3_client()
-    bucket = settings.AWS_STORAGE_BUCKET_NAME
-    with open(local_path, 'rb') as f:
-        s3.put_object(Bucket=bucket, Key=s3_path, Body=f, ContentType=content_type)
-
-
 # ========= 新增：输入文件有效性校验工具 =========
 def _sniff_file_type(local_path: str) -> str:
     """根据文件头、扩展名做简单类型嗅探，返回类型标签
@@ -228,15 +197,18 @@ def run_qc(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
     
     with tempfile.TemporaryDirectory() as tmpdir:
         # 下载数据文件
-        local_path = os.path.join(tmpdir, 'input.data')
-        try:
-            download_from_s3(data_uri, local_path)
-        except Exception as e:
-            return {
-                'artifacts': [],
-                'metrics': {'error': f'Failed to download data: {str(e)}'},
-                'evidence': {}
-            }
+        # 任务层提供的本地缓存副本（只读），否则下载到临时目录
+        local_path = inputs.get('local_path')
+        if not local_path:
+            local_path = os.path.join(tmpdir, 'input.data')
+            try:
+                download_from_s3(data_uri, local_path)
+            except Exception as e:
+                return {
+                    'artifacts': [],
+                    'metrics': {'error': f'Failed to download data: {str(e)}'},
+                    'evidence': {}
+                }
         
         # 嗅探类型并按类型处理
         ftype = _sniff_file_type(local_path)
@@ -503,7 +475,7 @@ def run_qc(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
         }
         
         return {
-            'artifacts': [{'name': 'QC Plots', 'type': 'image', 'path': plot_key}] if plot_key else [],
+            'artifacts': [{'name': 'QC Plots', 'type': 'image', 'path': plot_key, 'size': os.path.getsize(plot_path)}] if plot_key else [],
             'metrics': metrics,
             'evidence': evidence
         }
\ No newline at end of file
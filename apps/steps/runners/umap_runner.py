@@ -2,40 +2,8 @@ import os
 import tempfile
 from typing import Dict, Any, List
 
-import boto3
-from botocore.client import Config
-from django.conf import settings
-
-
-def get_s3_client():
-    """获取已配置的 S3/MinIO 客户端实例"""
-    return boto3.client(
-        's3',
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        config=Config(signature_version='s3v4'),
-        region_name='us-east-1'
-    )
-
-
-def download_from_s3(s3_path: str, local_path: str) -> None:
-    """从 S3/MinIO 下载对象到本地文件"""
-    s3 = get_s3_client()
-    bucket = settings.AWS_STORAGE_BUCKET_NAME
-    if s3_path.startswith('s3://'):
-        key = s3_path.split('/', 3)[-1]
-    else:
-        key = s3_path
-    s3.download_file(bucket, key, local_path)
-
-
-def upload_to_s3(local_path: str, key: str, content_type: str = 'application/octet-stream') -> None:
-    """上传本地文件到 S3/MinIO 指定 key"""
-    s3 = get_s3_client()
-    bucket = settings.AWS_STORAGE_BUCKET_NAME
-    with open(local_path, 'rb') as f:
-        s3.put_object(Bucket=bucket, Key=key, Body=f, ContentType=content_type)
+from ._s3util import download_from_s3, upload_to_s3
+from ._tableio import H5AD_WRITE_OPTIONS
 
 
 def run_umap(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
@@ -50,6 +18,8 @@ def run_umap(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
         import anndata as ad  # noqa: F401
         import numpy as np
         import pandas as pd
+        import matplotlib
+        matplotlib.use('Agg')  # 固定非交互式后端，worker 无显示环境且免去后端探测
         import matplotlib.pyplot as plt
     except ImportError as e:
         return {'artifacts': [], 'metrics': {'error': f'Missing required packages: {str(e)}'}, 'evidence': {}}
@@ -64,11 +34,14 @@ def run_umap(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
     metric = (params or {}).get('metric', 'euclidean')
 
     with tempfile.TemporaryDirectory() as tmpdir:
-        in_local = os.path.join(tmpdir, 'input.h5ad')
-        try:
-            download_from_s3(data_uri, in_local)
-        except Exception as e:
-            return {'artifacts': [], 'metrics': {'error': f'Failed to download input: {str(e)}'}, 'evidence': {}}
+        # 任务层提供的本地缓存副本（只读），否则下载到临时目录
+        in_local = inputs.get('local_path')
+        if not in_local:
+            in_local = os.path.join(tmpdir, 'input.h5ad')
+            try:
+                download_from_s3(data_uri, in_local)
+            except Exception as e:
+                return {'artifacts': [], 'metrics': {'error': f'Failed to download input: {str(e)}'}, 'evidence': {}}
 
         try:
             sc.settings.verbosity = 0
@@ -106,12 +79,12 @@ def run_umap(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
         scatter_local = os.path.join(tmpdir, 'umap_scatter.png')
         try:
             plt.figure(figsize=(6, 5))
-            plt.scatter(adata.obsm['X_umap'][:, 0], adata.obsm['X_umap'][:, 1], s=4, c='steelblue', alpha=0.7)
+            plt.scatter(adata.obsm['X_umap'][:, 0], adata.obsm['X_umap'][:, 1], s=4, c='steelblue', alpha=0.7, rasterized=True)
             plt.xlabel('UMAP1')
             plt.ylabel('UMAP2')
             plt.title('UMAP Embedding')
             plt.tight_layout()
-            plt.savefig(scatter_local, dpi=300, bbox_inches='tight')
+            plt.savefig(scatter_local, dpi=150, bbox_inches='tight')
             plt.close()
         except Exception:
             scatter_local = None
@@ -119,7 +92,7 @@ def run_umap(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
         # 保存H5AD
         out_local = os.path.join(tmpdir, 'umap_processed.h5ad')
         try:
-            adata.write_h5ad(out_local)
+            adata.write_h5ad(out_local, **H5AD_WRITE_OPTIONS)
         except Exception as e:
             return {'artifacts': [], 'metrics': {'error': f'Failed to write output H5AD: {str(e)}'}, 'evidence': {}}
 
@@ -144,10 +117,10 @@ def run_umap(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
             'summary': f'UMAP computed with n_neighbors={n_neighbors}, min_dist={min_dist}'
         }
         artifacts: List[Dict[str, Any]] = [
-            {'name': 'umap_embeddings.csv', 'type': 'csv', 'path': emb_s3},
-            {'name': 'umap_processed.h5ad', 'type': 'h5ad', 'path': out_s3},
+            {'name': 'umap_embeddings.csv', 'type': 'csv', 'path': emb_s3, 'size': os.path.getsize(emb_local)},
+            {'name': 'umap_processed.h5ad', 'type': 'h5ad', 'path': out_s3, 'size': os.path.getsize(out_local)},
         ]
         if scatter_s3:
-            artifacts.append({'name': 'umap_scatter.png', 'type': 'png', 'path': scatter_s3})
+            artifacts.append({'name': 'umap_scatter.png', 'type': 'png', 'path': scatter_s3, 'size': os.path.getsize(scatter_local)})
 
         return {'artifacts': artifacts, 'metrics': metrics, 'evidence': evidence}
\ No newline at end of file
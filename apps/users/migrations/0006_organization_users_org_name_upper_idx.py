@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-16 10:02
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_add_membership_invite_fields_and_fix_roles'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='organization',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='users_org_name_upper_idx'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 import uuid
 from django.db import models
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.functions import Upper
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
@@ -26,6 +28,12 @@ class Organization(models.Model):
     current_period_end = models.DateTimeField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # 支持 ActiveOrgMiddleware 按名称不区分大小写查找
+            models.Index(Upper('name'), name='users_org_name_upper_idx'),
+        ]
+
     def __str__(self):
         return self.name
     
@@ -176,4 +184,24 @@ def create_user_profile(sender, instance, created, **kwargs):
             UserProfile.objects.create(user=instance, organization=org, role='owner')
             Membership.objects.create(user=instance, organization=org, role='owner')
         except Exception:
-            pass
\ No newline at end of file
+            pass
+
+
+# user -> organization_id 缓存（ActiveOrgMiddleware 读取），资料变更/删除时失效。
+# 缓存为共享的 Redis（settings.CACHES），失效对所有 Web/Celery 进程生效；
+# 绕过信号的 queryset.update() 最多滞后 USER_ORG_CACHE_TTL 秒
+USER_ORG_CACHE_KEY = "user_org:{}"
+USER_ORG_CACHE_TTL = 60
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_user_org_cache(sender, instance, **kwargs):
+    cache.delete(USER_ORG_CACHE_KEY.format(instance.user_id))
+
+
+@receiver(pre_delete, sender=Organization)
+def invalidate_member_org_cache(sender, instance, **kwargs):
+    """组织删除时成员资料经 SET_NULL 批量更新（不触发 post_save），在删除前失效成员缓存"""
+    user_ids = UserProfile.objects.filter(organization=instance).values_list('user_id', flat=True)
+    cache.delete_many([USER_ORG_CACHE_KEY.format(user_id) for user_id in user_ids])
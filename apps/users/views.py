@@ -9,7 +9,7 @@ from rest_framework.response import Response
 
 from .models import Organization, UserProfile, Membership, LoginHistory
 from .serializers import UserSerializer
-from apps.projects.models import AuditLog
+from apps.projects.audit import record_audit
 
 def get_client_ip(request):
     """Get real client IP address"""
@@ -71,7 +71,7 @@ def login_view(request):
     
     # Audit
     try:
-        AuditLog.objects.create(
+        record_audit(
             user=user,
             action_type='execute',
             object_type='Auth',
@@ -111,7 +111,7 @@ def logout_view(request):
     
     logout(request)
     try:
-        AuditLog.objects.create(
+        record_audit(
             user=user,
             action_type='execute',
             object_type='Auth',
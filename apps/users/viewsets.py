@@ -16,7 +16,7 @@ from .serializers import (
     MembershipSerializer, APITokenSerializer, LoginHistorySerializer
 )
 from apps.common.permissions import IsOrgAdminOrOwner, RBACByRole
-from apps.projects.models import AuditLog
+from apps.projects.audit import record_audit
 
 def log_audit(user, action_type, object_type, object_id, changes=None, metadata=None, request=None):
     """Helper function to create audit log entries"""
@@ -31,7 +31,7 @@ def log_audit(user, action_type, object_type, object_id, changes=None, metadata=
             ip_address = request.META.get('REMOTE_ADDR')
         user_agent = request.META.get('HTTP_USER_AGENT', '')
     
-    AuditLog.objects.create(
+    record_audit(
         user=user,
         action_type=action_type,
         object_type=object_type,
@@ -6,6 +6,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
+import orjson
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -121,6 +122,22 @@ else:
         },
     }
 
+# Cache: shared across web and Celery processes so invalidations (e.g. the
+# user -> organization cache used for tenant scoping) reach every process
+if DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+
 # Celery configuration
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = 'django-db'
@@ -128,9 +145,26 @@ CELERY_CACHE_BACKEND = 'django-cache'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# scanpy runners are CPU/memory heavy: one process per task slot, recycled
+# periodically so AnnData/BLAS allocations don't accumulate in long-lived workers
+CELERY_WORKER_POOL = 'prefork'
+CELERY_WORKER_MAX_TASKS_PER_CHILD = 20
+CELERY_TASK_ACKS_LATE = True
+# Advice generation is light and latency-sensitive: keep it off the scanpy
+# prefork pool, e.g. `celery -A bioai_platform worker -Q advice -P threads`
+CELERY_TASK_ROUTES = {
+    'projects.generate_advice': {'queue': 'advice'},
+}
 # For development: run tasks eagerly in the same process
 CELERY_TASK_ALWAYS_EAGER = DEBUG
 CELERY_TASK_EAGER_PROPAGATES = True
+# Periodic tasks (celery beat)
+CELERY_BEAT_SCHEDULE = {
+    'flush-audit-logs': {
+        'task': 'projects.flush_audit_logs',
+        'schedule': 5.0,  # seconds
+    },
+}
 
 # MinIO/S3 configuration
 MINIO_ENDPOINT = os.getenv('MINIO_ENDPOINT', 'localhost:9000')
@@ -148,6 +182,8 @@ AWS_S3_CUSTOM_DOMAIN = None
 AWS_S3_SECURE_URLS = False
 AWS_DEFAULT_ACL = None
 AWS_S3_FILE_OVERWRITE = False
+# Runner / worker transfers: concurrent threads per multipart download or upload
+S3_MAX_CONCURRENCY = int(os.getenv('S3_MAX_CONCURRENCY', '16'))
 
 # Static files configuration
 STATIC_URL = '/static/'
@@ -169,6 +205,17 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # orjson 编解码，替代标准库 json
+    'DEFAULT_RENDERER_CLASSES': [
+        'drf_orjson_renderer.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'drf_orjson_renderer.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'ORJSON_RENDERER_OPTIONS': (orjson.OPT_NON_STR_KEYS,),
 }
 
 # SimpleJWT configuration
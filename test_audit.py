@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+审计日志缓冲测试：record_audit 入队/回退与 flush_buffer 的处理中列表、重试与死信
+"""
+import contextlib
+import os
+from unittest import mock
+
+import django
+import orjson
+import pytest
+import redis
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bioai_platform.settings')
+django.setup()
+
+from django.db import OperationalError
+from django.test import override_settings
+
+from apps.projects import audit
+
+
+class FakeRedis:
+    """flush_buffer 用到的 Redis 列表/字符串命令的内存实现"""
+
+    def __init__(self):
+        self.lists = {}
+        self.keys = {}
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+    def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        return list(items[start:] if end == -1 else items[start:end + 1])
+
+    def lmove(self, src, dst, wherefrom, whereto):
+        items = self.lists.get(src)
+        if not items:
+            return None
+        value = items.pop(0 if wherefrom == 'LEFT' else -1)
+        dst_items = self.lists.setdefault(dst, [])
+        dst_items.append(value) if whereto == 'RIGHT' else dst_items.insert(0, value)
+        return value
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.lists.pop(key, None)
+            self.keys.pop(key, None)
+
+    @contextlib.contextmanager
+    def pipeline(self, transaction=True):
+        yield _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def lmove(self, *args):
+        self.calls.append(args)
+
+    def execute(self):
+        return [self.client.lmove(*args) for args in self.calls]
+
+
+@pytest.fixture
+def fake_redis():
+    client = FakeRedis()
+    with mock.patch.object(audit, '_get_redis', return_value=client):
+        yield client
+
+
+@pytest.fixture
+def audit_log():
+    """替换 AuditLog 模型，并让 transaction.atomic 不触碰数据库连接"""
+    with mock.patch.object(audit, 'AuditLog') as model, \
+            mock.patch.object(audit.transaction, 'atomic', side_effect=lambda *a, **k: contextlib.nullcontext()):
+        yield model
+
+
+def _entry(n):
+    return orjson.dumps({'id': f'00000000-0000-7000-8000-{n:012d}', 'action_type': 'update',
+                         'object_type': 'project', 'object_id': str(n)})
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=False)
+def test_record_audit_buffers_entry_with_id(fake_redis, audit_log):
+    user = mock.Mock(pk=7)
+    audit.record_audit(user, 'update', 'project', '42', changes={'name': 'x'})
+    audit_log.objects.create.assert_not_called()
+    (raw,) = fake_redis.lists[audit.AUDIT_BUFFER_KEY]
+    entry = orjson.loads(raw)
+    assert entry['id'] and entry['user_id'] == 7 and entry['object_id'] == '42'
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=False)
+def test_record_audit_falls_back_to_sync_insert(audit_log):
+    client = mock.Mock()
+    client.rpush.side_effect = redis.ConnectionError()
+    with mock.patch.object(audit, '_get_redis', return_value=client):
+        audit.record_audit(None, 'delete', 'project', '42')
+    audit_log.objects.create.assert_called_once()
+    assert audit_log.objects.create.call_args.kwargs['object_id'] == '42'
+
+
+def test_record_audit_skips_entries_without_object_id(fake_redis, audit_log):
+    audit.record_audit(None, 'delete', 'project', None)
+    assert not fake_redis.lists
+    audit_log.objects.create.assert_not_called()
+
+
+def test_flush_writes_batch_and_clears_processing(fake_redis, audit_log):
+    fake_redis.rpush(audit.AUDIT_BUFFER_KEY, *(_entry(i) for i in range(3)))
+    assert audit.flush_buffer() == 3
+    audit_log.objects.bulk_create.assert_called_once()
+    assert not fake_redis.lists.get(audit.AUDIT_BUFFER_KEY)
+    assert not fake_redis.lists.get(audit.AUDIT_PROCESSING_KEY)
+    assert audit.AUDIT_FLUSH_LOCK_KEY not in fake_redis.keys
+
+
+def test_flush_keeps_batch_when_database_unavailable(fake_redis, audit_log):
+    """数据库不可用：本批留在处理中列表，下次 flush 重试写入，不丢记录"""
+    entries = [_entry(i) for i in range(3)]
+    fake_redis.rpush(audit.AUDIT_BUFFER_KEY, *entries)
+    audit_log.objects.bulk_create.side_effect = OperationalError('db down')
+    audit_log.return_value.save.side_effect = OperationalError('db down')
+
+    assert audit.flush_buffer() == 0
+    assert fake_redis.lists[audit.AUDIT_PROCESSING_KEY] == entries
+
+    audit_log.objects.bulk_create.side_effect = None
+    assert audit.flush_buffer() == 3
+    assert not fake_redis.lists.get(audit.AUDIT_PROCESSING_KEY)
+
+
+def test_flush_moves_bad_rows_to_dead_letter(fake_redis, audit_log):
+    """整批失败后逐条重试：能写的写入，坏数据进入死信列表"""
+    entries = [_entry(i) for i in range(2)]
+    fake_redis.rpush(audit.AUDIT_BUFFER_KEY, *entries)
+    audit_log.objects.bulk_create.side_effect = OperationalError('batch failed')
+    audit_log.return_value.save.side_effect = [None, ValueError('bad row')]
+
+    assert audit.flush_buffer() == 1
+    assert fake_redis.lists[audit.AUDIT_DEAD_LETTER_KEY] == [entries[1]]
+    assert not fake_redis.lists.get(audit.AUDIT_PROCESSING_KEY)
+
+
+def test_flush_skips_when_another_flush_holds_the_lock(fake_redis, audit_log):
+    fake_redis.rpush(audit.AUDIT_BUFFER_KEY, _entry(1))
+    fake_redis.set(audit.AUDIT_FLUSH_LOCK_KEY, 1)
+    assert audit.flush_buffer() == 0
+    audit_log.objects.bulk_create.assert_not_called()
+    assert fake_redis.lists[audit.AUDIT_BUFFER_KEY]
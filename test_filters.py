@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+列表查询参数解析测试：parse_list_filters 的空值处理、tags 拆分与 pinned 真值判断
+"""
+import dataclasses
+
+import pytest
+
+from apps.projects.filters import ListFilters, parse_list_filters
+
+
+def test_empty_query_params():
+    f = parse_list_filters({})
+    assert f == ListFilters(q=None, tags=(), status=None, created_after=None, created_before=None,
+                            project=None, dataset=None, step_type=None, pinned=False, since=None)
+
+
+def test_empty_strings_treated_as_missing():
+    f = parse_list_filters({'q': '', 'status': '', 'tags': '', 'since': ''})
+    assert f.q is None and f.status is None and f.since is None
+    assert f.tags == ()
+
+
+def test_tags_split_and_stripped():
+    assert parse_list_filters({'tags': ' a, b ,,c , '}).tags == ('a', 'b', 'c')
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('true', True), ('1', True), ('yes', True), ('false', False), ('0', False), ('True', False), (None, False),
+])
+def test_pinned(value, expected):
+    params = {} if value is None else {'pinned': value}
+    assert parse_list_filters(params).pinned is expected
+
+
+def test_values_passed_through():
+    f = parse_list_filters({'q': 'liver', 'project': 'p1', 'dataset': 'd1', 'step_type': 'qc',
+                            'created_after': '2024-01-01', 'created_before': '2024-02-01'})
+    assert (f.q, f.project, f.dataset, f.step_type) == ('liver', 'p1', 'd1', 'qc')
+    assert (f.created_after, f.created_before) == ('2024-01-01', '2024-02-01')
+
+
+def test_filters_are_immutable():
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        parse_list_filters({}).q = 'x'
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""
+uuid7 主键测试：版本/变体位与按毫秒时间戳的排序
+"""
+import time
+import uuid
+from unittest import mock
+
+from apps.common import ids
+from apps.common.ids import uuid7
+
+
+def test_version_and_variant():
+    value = uuid7()
+    assert isinstance(value, uuid.UUID)
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+
+
+def test_timestamp_prefix_is_unix_millis():
+    ms = 1_700_000_000_123
+    with mock.patch.object(ids.time, 'time_ns', return_value=ms * 1_000_000):
+        value = uuid7()
+    assert value.int >> 80 == ms
+
+
+def test_ordered_across_milliseconds():
+    """不同毫秒生成的 id 按生成顺序单调递增（字符串与 UUID 比较一致）"""
+    start = time.time_ns()
+    values = []
+    for step in range(100):
+        with mock.patch.object(ids.time, 'time_ns', return_value=start + step * 1_000_000):
+            values.append(uuid7())
+    assert values == sorted(values)
+    assert [str(v) for v in values] == sorted(str(v) for v in values)
+
+
+def test_unique_within_same_millisecond():
+    with mock.patch.object(ids.time, 'time_ns', return_value=time.time_ns()):
+        values = {uuid7() for _ in range(1000)}
+    assert len(values) == 1000
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Runner 参数归一化测试：PARAM_SCHEMAS 默认值/类型转换、PARAM_ALIASES 别名与非法参数的 FAILED 路径
+"""
+import os
+from unittest import mock
+
+import django
+import pytest
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bioai_platform.settings')
+django.setup()
+
+from apps.projects import tasks
+from apps.projects.tasks import PARAM_SCHEMAS, _normalize_params, _parse_bool
+
+
+def test_defaults_filled_for_missing_and_none():
+    """缺省或显式 None 的参数补为 schema 默认值"""
+    out = _normalize_params('pca', {'svd_solver': None})
+    assert out['n_components'] == 50
+    assert out['svd_solver'] == 'randomized'
+    assert out['embedding_format'] == 'parquet'
+
+
+def test_values_cast_to_declared_type():
+    """字符串参数按声明类型转换"""
+    out = _normalize_params('qc', {'min_genes': '300', 'max_mito': '0.1'})
+    assert out['min_genes'] == 300
+    assert out['max_mito'] == pytest.approx(0.1)
+
+
+def test_undeclared_params_kept_and_input_not_mutated():
+    """未声明的参数原样保留，调用方的字典不被修改"""
+    params = {'n_top_genes': '1500', 'batch_key': 'sample'}
+    out = _normalize_params('hvg', params)
+    assert out['n_top_genes'] == 1500
+    assert out['batch_key'] == 'sample'
+    assert params == {'n_top_genes': '1500', 'batch_key': 'sample'}
+
+
+def test_unknown_step_type_passes_through():
+    params = {'anything': 1}
+    assert _normalize_params('unknown', params) is params
+
+
+def test_alias_resolved_to_canonical_name():
+    """n_pcs（步骤默认参数/建议补丁）映射为 PCA Runner 读取的 n_components"""
+    out = _normalize_params('pca', {'n_pcs': '30'})
+    assert out['n_components'] == 30
+    assert 'n_pcs' not in out
+
+
+def test_canonical_name_wins_over_alias():
+    out = _normalize_params('pca', {'n_pcs': 30, 'n_components': 20})
+    assert out['n_components'] == 20
+
+
+def test_cluster_shares_clustering_schema():
+    assert PARAM_SCHEMAS['cluster'] is PARAM_SCHEMAS['clustering']
+
+
+@pytest.mark.parametrize('value', ['abc', '1.5'])
+def test_cast_failure_raises(value):
+    with pytest.raises(ValueError):
+        _normalize_params('pca', {'n_components': value})
+
+
+@pytest.mark.parametrize('value, expected', [
+    (True, True), (False, False), (1, True), (0, False),
+    ('true', True), ('False', False), ('1', True), ('0', False), (' yes ', True), ('off', False),
+])
+def test_parse_bool(value, expected):
+    assert _parse_bool(value) is expected
+
+
+@pytest.mark.parametrize('value', ['maybe', '', 2, 0.0])
+def test_parse_bool_rejects_unknown(value):
+    with pytest.raises(ValueError):
+        _parse_bool(value)
+
+
+def test_subset_to_hvg_string_false_is_false():
+    """bool('false') 为 True；schema 必须按字面解析"""
+    assert _normalize_params('hvg', {'subset_to_hvg': 'false'})['subset_to_hvg'] is False
+    assert _normalize_params('hvg', {})['subset_to_hvg'] is True
+
+
+def test_run_step_invalid_params_marks_failed():
+    """参数无法转换时不调用 Runner，StepRun 直接记为 FAILED 并带上错误信息"""
+    run = mock.MagicMock()
+    run.id = 'run-1'
+    run.step.step_type = 'pca'
+    run.params_json = {'n_components': 'abc'}
+    runner = mock.Mock()
+    with mock.patch.object(tasks, 'StepRun') as step_run_model, \
+            mock.patch.object(tasks, 'ws_send'), \
+            mock.patch.dict(tasks.RUNNERS, {'pca': runner}):
+        step_run_model.objects.select_related.return_value.get.return_value = run
+        result = tasks.run_step('run-1')
+
+    runner.assert_not_called()
+    assert result['status'] == 'FAILED'
+    assert run.status == 'FAILED'
+    assert result['metrics']['error'].startswith('Invalid parameters:')
+    run.save.assert_called_once()
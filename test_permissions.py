@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+RBAC 权限测试：_build_allowed 展开的 (role, method) 查找表与 _membership_role 的请求内缓存
+"""
+import os
+from types import SimpleNamespace
+from unittest import mock
+
+import django
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bioai_platform.settings')
+django.setup()
+
+from apps.common import permissions
+from apps.common.permissions import (
+    ProjectRBAC, RBACByRole, SessionRBAC, _build_allowed, _membership_role,
+)
+
+
+def _user(pk=1):
+    return SimpleNamespace(pk=pk, is_authenticated=True)
+
+
+def _org(pk='org-1'):
+    return SimpleNamespace(pk=pk)
+
+
+def _request(method='POST', user=None, org=None):
+    return SimpleNamespace(method=method, user=user or _user(), org=org or _org())
+
+
+def test_build_allowed_flattens_matrix():
+    allowed = _build_allowed({'GET': 'view', 'DELETE': 'admin'}, {'admin': {'admin', 'view'}, 'viewer': {'view'}})
+    assert allowed == frozenset({('admin', 'GET'), ('admin', 'DELETE'), ('viewer', 'GET')})
+
+
+def test_rbac_table_matches_role_matrix():
+    """查找表与原先逐次查 method_to_capability/role_matrix 的判定一致"""
+    for role, caps in RBACByRole.role_matrix.items():
+        for method, cap in RBACByRole.method_to_capability.items():
+            assert ((role, method) in RBACByRole._allowed) == (cap in caps)
+
+
+def test_scientist_delete_only_on_sessions_and_projects():
+    assert ('scientist', 'DELETE') not in RBACByRole._allowed
+    assert ('scientist', 'DELETE') in SessionRBAC._allowed
+    assert ('scientist', 'DELETE') in ProjectRBAC._allowed
+    assert ('viewer', 'DELETE') not in SessionRBAC._allowed
+
+
+def test_has_permission_uses_resolved_role():
+    perm = RBACByRole()
+    with mock.patch.object(permissions, '_resolve_role', return_value='viewer'):
+        assert perm.has_permission(_request('GET'), None)
+        assert not perm.has_permission(_request('POST'), None)
+    with mock.patch.object(permissions, '_resolve_role', return_value=None):
+        assert not perm.has_permission(_request('PATCH'), None)
+
+
+def _membership_query(membership, role):
+    """让替换后的 Membership 查询返回 role，返回记录 filter 调用的 mock"""
+    membership.objects.filter.return_value.values_list.return_value.first.return_value = role
+    return membership.objects.filter
+
+
+@mock.patch.object(permissions, 'Membership')
+def test_membership_role_memoized_per_request(membership):
+    query = _membership_query(membership, 'admin')
+    request = _request()
+    assert _membership_role(request) == 'admin'
+    assert _membership_role(request) == 'admin'
+    assert query.call_count == 1
+
+
+@mock.patch.object(permissions, 'Membership')
+def test_membership_role_memoizes_non_member(membership):
+    """非成员（None）同样缓存，不会每个权限类各查一次"""
+    query = _membership_query(membership, None)
+    request = _request()
+    assert _membership_role(request) is None
+    assert _membership_role(request) is None
+    assert query.call_count == 1
+
+
+@mock.patch.object(permissions, 'Membership')
+def test_membership_role_requeries_when_org_changes(membership):
+    query = _membership_query(membership, 'viewer')
+    request = _request()
+    _membership_role(request)
+    request.org = _org('org-2')
+    _membership_role(request)
+    assert query.call_count == 2
+
+
+@mock.patch.object(permissions, 'Membership')
+def test_membership_role_anonymous_or_no_org(membership):
+    query = _membership_query(membership, 'owner')
+    anon = SimpleNamespace(pk=None, is_authenticated=False)
+    assert _membership_role(_request(user=anon)) is None
+    assert _membership_role(SimpleNamespace(method='GET', user=_user(), org=None)) is None
+    query.assert_not_called()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+建议规则引擎测试：evaluate 的命中判断、模板填充、补丁生成与规则顺序
+"""
+from apps.advice.constants import ADVICE_PARAM_OPT, ADVICE_QUALITY, PATCH_PARAMS, RISK_HIGH, RISK_LOW
+from apps.advice.rules import Rule, Suggestion, evaluate
+
+RULES = (
+    Rule(
+        predicate=lambda c: c['mito'] > 0.2,
+        title='High mitochondrial fraction ({mito:.0%})',
+        description='Lower max_mito below {mito:.2f}',
+        evidence_text='{cells} cells',
+        patch=lambda c: {'max_mito': round(c['mito'] - 0.05, 2)},
+        advice_type=ADVICE_QUALITY,
+        risk_level=RISK_HIGH,
+    ),
+    Rule(
+        predicate=lambda c: c['cells'] < 1000,
+        title='Few cells',
+        description='Only {cells} cells',
+        evidence_text='',
+        patch=lambda c: {'min_genes': 100},
+        advice_type=ADVICE_PARAM_OPT,
+        risk_level=RISK_LOW,
+        patch_type='method',
+    ),
+)
+
+
+def test_no_rule_matches():
+    assert evaluate(RULES, {'mito': 0.1, 'cells': 5000}) == []
+
+
+def test_templates_and_patch_filled_from_context():
+    (s,) = evaluate(RULES, {'mito': 0.25, 'cells': 5000})
+    assert s == Suggestion(ADVICE_QUALITY, RISK_HIGH, 'High mitochondrial fraction (25%)',
+                           'Lower max_mito below 0.25', '5000 cells', {'max_mito': 0.2}, PATCH_PARAMS)
+
+
+def test_matches_keep_rule_order_and_patch_type():
+    suggestions = evaluate(RULES, {'mito': 0.3, 'cells': 500})
+    assert [s.title for s in suggestions] == ['High mitochondrial fraction (30%)', 'Few cells']
+    assert suggestions[1].patch_type == 'method'
+    assert suggestions[1].description == 'Only 500 cells'
+
+
+def test_patch_is_built_per_call():
+    """patch 每次调用重新生成，不同建议之间不共享可变字典"""
+    first = evaluate(RULES, {'mito': 0.3, 'cells': 5000})[0]
+    second = evaluate(RULES, {'mito': 0.3, 'cells': 5000})[0]
+    assert first.patch_json == second.patch_json
+    assert first.patch_json is not second.patch_json
+
+
+def test_suggestion_fields_match_advice_kwargs():
+    (s,) = evaluate(RULES[1:], {'mito': 0.0, 'cells': 10})
+    assert set(s._asdict()) == {'advice_type', 'risk_level', 'title', 'description',
+                                'evidence_text', 'patch_json', 'patch_type'}
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+WebSocket JWT 鉴权测试：_extract_token 的查询串扫描（只解码 token 值，键需完整匹配）
+"""
+import os
+
+import django
+import pytest
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bioai_platform.settings')
+django.setup()
+
+from apps.common.ws_auth import _extract_token
+
+
+@pytest.mark.parametrize('qs, expected', [
+    (b'token=abc', 'abc'),
+    (b'foo=1&token=abc', 'abc'),
+    (b'token=abc&foo=1', 'abc'),
+    (b'foo=1&token=abc&bar=2', 'abc'),
+    (b'token=a%2Bb%3D', 'a+b='),
+    (b'token=a+b', 'a b'),
+])
+def test_extract_token(qs, expected):
+    assert _extract_token(qs) == expected
+
+
+@pytest.mark.parametrize('qs', [b'', b'foo=1', b'token=', b'token=&foo=1', b'tokens=abc'])
+def test_extract_token_missing(qs):
+    assert _extract_token(qs) is None
+
+
+def test_csrftoken_is_not_a_token():
+    """csrftoken= 以 token= 结尾，但不是 token 参数"""
+    assert _extract_token(b'csrftoken=xyz') is None
+    assert _extract_token(b'csrftoken=xyz&token=abc') == 'abc'
+    assert _extract_token(b'a=1&csrftoken=xyz') is None
+
+
+def test_first_non_empty_token_wins():
+    """与 parse_qs(...).get('token', [None])[0] 一致：空值被跳过，取第一个非空值"""
+    assert _extract_token(b'token=&token=abc&token=def') == 'abc'